@@ -0,0 +1,172 @@
+import sys
+import os
+import json
+import time
+import tracemalloc
+from sim.runner import Runner
+from benchmarks.worlds import WORLDS, makeSpecification, makeTrajectory, useGrid
+
+# runs the trajectory of each synthetic world through the state estimator and the action learners and reports,
+# per operation, the latency and the peak memory allocated while it ran, and the number of hypotheses.
+#   python3 -m benchmarks.bench                  compare every world against its saved baseline
+#   python3 -m benchmarks.bench -w simple-16x6-8obj -w ...
+#   python3 -m benchmarks.bench --save           overwrite the baselines
+#   python3 -m benchmarks.bench -l               use lazy branching in the state estimator
+# baselines are in benchmarks/baselines/<world>.json; a regression is an operation whose mean latency or
+# peak memory grew by more than the tolerance, or a hypothesis count that changed.
+
+OPS = [ 'applyAction', 'observe', 'hypothesisRemoval', 'addExample' ]
+BASELINE_DIR = os.path.join( os.path.dirname(os.path.abspath(__file__)), 'baselines' )
+# differences below these are noise
+MIN_MS = 0.05
+MIN_KIB = 64
+
+
+def runWorld(world, lazyBranching = False, traceMemory = False):
+  # one pass over the trajectory of the world; returns per operation [ (seconds, peak bytes) ] and the hypothesis counts
+  previousGrid = useGrid(world)
+  try:
+    spec = makeSpecification(world)
+    trajectory = makeTrajectory(world, spec)
+    runner = Runner(spec, True, False, lazyBranching)
+    gt, se = runner.gt, runner.se
+    # the learners are written for the fully observable case, they see the whole ground truth state
+    fullState = lambda: { pred: gt.hyp.get(0, pred) for pred in gt.preds }
+
+    samples = { op: [] for op in OPS }
+    def timed(op, func, *args):
+      if traceMemory:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+      t = time.perf_counter()
+      func(*args)
+      t = time.perf_counter() - t
+      peak = tracemalloc.get_traced_memory()[1] - start if traceMemory else 0
+      samples[op] += [ (t, peak) ]
+
+    hypCounts = []
+    prevState = fullState()
+    for ( cmd, param, learnerParam, learnerParamTypes ) in trajectory:
+      gt.applyAction( runner.gtActions[cmd], param )
+      timed( 'applyAction', se.applyAction, runner.seActions[cmd], param )
+      hypCounts += [ se.numHyp() ]
+      newState = fullState()
+      timed( 'addExample', runner.actionLearners[cmd].addExample, (prevState, learnerParam, learnerParamTypes, newState) )
+      prevState = newState
+      timed( 'observe', se.observe, runner.gtObserver() )
+      timed( 'hypothesisRemoval', se.hypothesisRemoval )
+    hypCounts += [ se.numHyp() ]
+    return ( samples, hypCounts )
+  finally:
+    useGrid(previousGrid)
+
+
+def benchmark(world, lazyBranching = False):
+  # latency comes from a pass without tracemalloc, which slows allocation down; memory from a second pass
+  ( timeSamples, hypCounts ) = runWorld(world, lazyBranching)
+  tracemalloc.start()
+  try:
+    ( memSamples, _ ) = runWorld(world, lazyBranching, True)
+    peakKiB = tracemalloc.get_traced_memory()[1] / 1024
+  finally:
+    tracemalloc.stop()
+
+  ops = {}
+  for op in OPS:
+    times = sorted( t for (t, _) in timeSamples[op] )
+    ops[op] = { 'calls': len(times),
+                'meanMs': round( 1000 * sum(times) / len(times), 4 ),
+                'p50Ms': round( 1000 * times[ len(times) // 2 ], 4 ),
+                'maxMs': round( 1000 * times[-1], 4 ),
+                'peakKiB': round( max( peak for (_, peak) in memSamples[op] ) / 1024, 1 ) }
+  return { 'world': world,
+           'lazyBranching': lazyBranching,
+           'ops': ops,
+           'hypotheses': { 'max': max(hypCounts), 'final': hypCounts[-1], 'total': sum(hypCounts) },
+           'peakKiB': round(peakKiB, 1) }
+
+
+def baselinePath(name, lazyBranching):
+  return os.path.join( BASELINE_DIR, name + ( '-lazy' if lazyBranching else '' ) + '.json' )
+
+
+def compare(result, baseline, tolerance):
+  # returns a list of lines describing regressions
+  regressions = []
+  if baseline['world'] != result['world']:
+    return [ "world changed, save a new baseline" ]
+  for key in ( 'max', 'final', 'total' ):
+    if result['hypotheses'][key] != baseline['hypotheses'][key]:
+      regressions += [ "hypotheses %s: %i -> %i" %(key, baseline['hypotheses'][key], result['hypotheses'][key]) ]
+  for op in OPS:
+    (now, then) = ( result['ops'][op], baseline['ops'][op] )
+    if now['meanMs'] > tolerance * then['meanMs'] and now['meanMs'] - then['meanMs'] > MIN_MS:
+      regressions += [ "%s mean: %.3f ms -> %.3f ms" %(op, then['meanMs'], now['meanMs']) ]
+    if now['peakKiB'] > tolerance * then['peakKiB'] and now['peakKiB'] - then['peakKiB'] > MIN_KIB:
+      regressions += [ "%s peak memory: %.1f KiB -> %.1f KiB" %(op, then['peakKiB'], now['peakKiB']) ]
+  return regressions
+
+
+def report(name, result, baseline):
+  print("%s: %i steps, hypotheses max %i final %i, peak %.1f KiB" %( name, result['world']['steps'],
+        result['hypotheses']['max'], result['hypotheses']['final'], result['peakKiB'] ))
+  print("  %-18s %8s %10s %10s %10s %12s %10s" %('operation', 'calls', 'mean ms', 'p50 ms', 'max ms', 'peak KiB', 'vs base'))
+  for op in OPS:
+    stats = result['ops'][op]
+    ratio = ''
+    if baseline is not None and baseline['ops'][op]['meanMs'] > 0:
+      ratio = "%.2fx" %( stats['meanMs'] / baseline['ops'][op]['meanMs'] )
+    print("  %-18s %8i %10.3f %10.3f %10.3f %12.1f %10s" %( op, stats['calls'], stats['meanMs'], stats['p50Ms'],
+          stats['maxMs'], stats['peakKiB'], ratio ))
+
+
+def main(argv):
+  # returns 1 if any world regressed against its baseline, 0 otherwise
+  names, save, lazyBranching, tolerance = [], False, False, 1.5
+  i = 0
+  while i < len(argv):
+    if argv[i] == '-w':
+      i += 1
+      names += [argv[i]]
+    elif argv[i] == '--save':
+      save = True
+    elif argv[i] == '-l':
+      lazyBranching = True
+    elif argv[i] == '-t':
+      i += 1
+      tolerance = float(argv[i])
+    else:
+      print("unknown argument %s; worlds: %s" %(argv[i], ", ".join(WORLDS)))
+      return 1
+    i += 1
+  if len(names) == 0:
+    names = list(WORLDS)
+
+  failed = False
+  for name in names:
+    result = benchmark( WORLDS[name], lazyBranching )
+    path = baselinePath(name, lazyBranching)
+    baseline = None
+    if os.path.exists(path):
+      with open(path) as f:
+        baseline = json.load(f)
+
+    report(name, result, baseline)
+    if save:
+      os.makedirs(BASELINE_DIR, exist_ok=True)
+      with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write("\n")
+      print("  saved %s" %path)
+    elif baseline is None:
+      print("  no baseline, run with --save")
+    else:
+      regressions = compare(result, baseline, tolerance)
+      for line in regressions:
+        print("  REGRESSION " + line)
+      failed = failed or len(regressions) != 0
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit( main(sys.argv[1:]) )
@@ -0,0 +1,111 @@
+import random
+from sim.util.specification_util import loadSpecification, processInputs
+from sim.util.commands import makeParams
+from sim.util.action_model_util import GRID
+from sim.state_estimator import StateEstimator
+
+# synthetic worlds built on the action models of the simple and slippery specifications.
+# a world is a dict:
+#   spec      specification whose action models are used (simpleComplete, slipperyComplete)
+#   width     columns of the grid, x in [0, width)
+#   height    rows of the grid, y in [0, height)
+#   objects   number of objects, laid out on the floor left to right
+#   unknown   number of object bool predicates (movable, slippery) left out of the first observation
+#   steps     length of the trajectory
+#   seed      seed of the random trajectory
+# objects follow the pattern of the original specifications: 0 and 1 are movable, 2 and 3 are not,
+# and in slippery worlds 0 is slippery; the pattern repeats every 4 objects.
+
+WORLDS = {
+  'simple-9x4-4obj':           { 'spec': 'simpleComplete',   'width': 9,  'height': 4, 'objects': 4,  'unknown': 0, 'steps': 200,  'seed': 0 },
+  'simple-9x4-4obj-unknown':   { 'spec': 'simpleComplete',   'width': 9,  'height': 4, 'objects': 4,  'unknown': 4, 'steps': 200,  'seed': 0 },
+  'simple-9x4-4obj-long':      { 'spec': 'simpleComplete',   'width': 9,  'height': 4, 'objects': 4,  'unknown': 0, 'steps': 1000, 'seed': 1 },
+  'simple-16x6-8obj':          { 'spec': 'simpleComplete',   'width': 16, 'height': 6, 'objects': 8,  'unknown': 2, 'steps': 200,  'seed': 2 },
+  'simple-32x8-16obj':         { 'spec': 'simpleComplete',   'width': 32, 'height': 8, 'objects': 16, 'unknown': 4, 'steps': 200,  'seed': 3 },
+  'slippery-9x4-4obj':         { 'spec': 'slipperyComplete', 'width': 9,  'height': 4, 'objects': 4,  'unknown': 8, 'steps': 200,  'seed': 0 },
+  'slippery-16x6-8obj':        { 'spec': 'slipperyComplete', 'width': 16, 'height': 6, 'objects': 8,  'unknown': 6, 'steps': 200,  'seed': 2 },
+}
+
+
+def makeSpecification(world):
+  # a specification dict, as returned by loadSpecification, for the world
+  spec = dict( loadSpecification(world['spec']) )
+  slippery = spec['slippery']
+
+  initial_conditions = [ (-1, 'armEmpty', 'bool', True ), (-1, 'objectHeld', 'cat', -1 ),
+                         (-1, 'pos', 'cat', (0, world['height'] - 2) ), (-1, 'movable', 'bool', True ) ]
+  objectBools = []
+  for i in range(world['objects']):
+    initial_conditions += [ (i, 'pos', 'cat', ( i % world['width'], i // world['width'] ) ) ]
+    initial_conditions += [ (i, 'movable', 'bool', i % 4 < 2 ) ]
+    objectBools += [ (i, 'movable') ]
+    if slippery:
+      initial_conditions += [ (i, 'slippery', 'bool', i % 4 == 0 ) ]
+      objectBools += [ (i, 'slippery') ]
+
+  allPreds = [ (pred[0], pred[1]) for pred in initial_conditions ]
+  unknown = objectBools[ :world['unknown'] ]
+  spec['initial_conditions'] = initial_conditions
+  spec['observed_predicates_first'] = [ pred for pred in allPreds if pred not in unknown ]
+  # as in the original specifications: everything is observed in simple worlds, only positions in slippery ones
+  if slippery:
+    spec['observed_predicates'] = [ pred for pred in allPreds if pred[1] == 'pos' ]
+  else:
+    spec['observed_predicates'] = allPreds
+  return spec
+
+
+def useGrid(world):
+  # resize the grid the action models check against; returns the previous size
+  previous = dict(GRID)
+  GRID.update( { 'width': world['width'], 'height': world['height'] } )
+  return previous
+
+
+def makeTrajectory(world, spec):
+  # a random walk of the arm that picks up objects under it and puts them back down.
+  # a ground truth estimator is stepped along to keep the walk sensible; the grid must be set with useGrid.
+  # returns a list of ( cmd, param, learnerParam, learnerParamTypes )
+  ( bool_preds, cat_preds, init_conds, _, _, _ ) = processInputs(
+    spec['initial_conditions'], spec['observed_predicates'], spec['observed_predicates_first'] )
+  gt = StateEstimator(bool_preds, cat_preds, False)
+  gt.observe(init_conds)
+
+  rng = random.Random( world['seed'] )
+  target = None
+  trajectory = []
+  for _ in range(world['steps']):
+    q = gt.hyp.get(0, '-1.pos')
+    below = ( q[0], q[1] - 1 )
+    held = gt.hyp.get(0, '-1.objectHeld')
+    positions = { i: gt.hyp.get(0, str(i) + '.pos') for i in range(world['objects']) }
+    objectBelow = None
+    for i in positions:
+      if positions[i] == below:
+        objectBelow = i
+
+    if held == -1 and objectBelow is not None and rng.random() < 0.5:
+      cmd, args = 'pick', ( objectBelow, below, q )
+      target = None
+    elif held != -1 and rng.random() < 0.2:
+      cmd, args = 'place', ( held, below, q )
+      target = None
+    else:
+      # head for the cell above an object when the arm is empty, anywhere when it is not; sometimes wander
+      if target is None or target == q:
+        if held == -1:
+          p = positions[ rng.randrange(world['objects']) ]
+          target = ( p[0], p[1] + 1 )
+        else:
+          target = ( rng.randrange(world['width']), rng.randrange(1, world['height']) )
+      moves = [ (q[0] + dx, q[1] + dy) for (dx, dy) in ( (0,1), (0,-1), (1,0), (-1,0) ) ]
+      moves = [ q2 for q2 in moves if 0 <= q2[0] < world['width'] and 0 <= q2[1] < world['height'] ]
+      closer = [ q2 for q2 in moves if abs(q2[0] - target[0]) + abs(q2[1] - target[1]) < abs(q[0] - target[0]) + abs(q[1] - target[1]) ]
+      if len(closer) != 0 and rng.random() < 0.8:
+        moves = closer
+      cmd, args = 'move', ( q, rng.choice(moves) )
+
+    ( param, learnerParam, learnerParamTypes ) = makeParams(cmd, args)
+    gt.applyAction( spec['gt_actions'][cmd], param )
+    trajectory += [ ( cmd, param, learnerParam, learnerParamTypes ) ]
+  return trajectory
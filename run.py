@@ -2,33 +2,33 @@ import os # os path
 import sys, getopt # passing command line arguments
 import numpy as np 
 
-try:
-  from tkinter import Tk, Canvas, Toplevel
-except ImportError:
-  from Tkinter import Tk, Canvas, Toplevel
-
 # imports from local files
-from sim.Environment import Environment
 from sim.util.utils import user_input
 
+def usage():
+  print('usage is: python3 run.py -d -t')
+  print('\t-d for demo mode')
+  print('\t-t for testing mode')
+  print('\t-b <file> for headless batch mode: run the commands in the file, no GUI')
+  print('\t-o <file> to append the commands of the session to a trajectory log')
+  print('\t-h for help')
+
 def main(argv):
   print(argv)
-  testMode, demoMode = False, False
-  if len(argv) > 1:
-    print('usage is: python3 run.py -d -t')
-    print('\t-d for demo mode')
-    print('\t-t for testing mode')
-    print('\t-h for help')
+  testMode, demoMode, batchFile, logPath = False, False, None, None
+  if len(argv) == 2 and argv[0] == '-b':
+    batchFile = argv[1]
+  elif len(argv) == 2 and argv[0] == '-o':
+    logPath = argv[1]
+  elif len(argv) > 1:
+    usage()
     sys.exit(2)
-  elif len(argv) == 0:
+  if batchFile is None and len(argv) in (0, 2):
     testMode = True
 
   for arg in argv:
     if arg == '-h':
-      print('usage is: python3 run.py -d -t')
-      print('\t-d for demo mode')
-      print('\t-t for testing mode')
-      print('\t-h for help')
+      usage()
       sys.exit()
     elif arg == "-d":
       demoMode = True
@@ -37,7 +37,13 @@ def main(argv):
       testMode = True
       print("IN TEST MODE")
 
-  env = Environment(3, 9)
+  if batchFile is not None:
+    # no tkinter anywhere on this path
+    from sim.runner import main as runBatch
+    sys.exit( runBatch([batchFile]) )
+
+  from sim.Environment import Environment
+  env = Environment(3, 9, logPath = logPath)
 
   if testMode:
     env.inTestMode()
@@ -46,4 +52,4 @@ def main(argv):
 
 if __name__ == '__main__':
     main(sys.argv[1:])
-    user_input("Finish?")
\ No newline at end of file
+    user_input("Finish?")
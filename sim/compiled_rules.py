@@ -0,0 +1,454 @@
+import numpy as np
+import pandas as pd
+import pickle
+import itertools
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from sim.hypothesis_store import UNKNOWN
+
+# a rule / action bound to a parameter assignment and compiled against the columns of a HypothesisStore.
+# predicate names are resolved to bits and columns once; preconditions and effects are then evaluated
+# for all hypotheses at once with masks. function preconditions still run per hypothesis, each hypothesis
+# getting its own copy of the parameters, since functions may write into them (KinMove sets obj_held).
+# a function that declares the predicates it reads (func.reads, see declaredPreds) runs once per group of hypotheses
+# that agree on them, its result and parameter copy shared by the group. the predicates it needs known to decide
+# (func.needs) are checked for all hypotheses at once by the sufficiency analysis.
+# with several workers, those function calls are sharded across a process pool, kept by the StateEstimator and
+# reused from one action to the next. a compiled action and the schema of the store are sent to the workers once,
+# later calls only send the rows.
+
+# below this many function calls, shipping them to the pool costs more than it saves. this counts the rows functions
+# run on after grouping, one per group of hypotheses that agree on what the functions read, not hypotheses.
+# decoding a row and running KinMove takes ~50us; sending a row to a worker and its results back ~20us, plus ~0.3ms
+# per shard: with 2 workers the pool pays off past ~500 calls. with functions that declare their reads, as those of
+# the specifications do, this takes thousands of hypotheses that differ in what the functions read
+PARALLEL_MIN_ROWS = 500
+# shards per worker, so that a slow shard doesn't keep the other workers idle
+SHARDS_PER_WORKER = 4
+
+
+class CompiledRule:
+  def __init__(self, rule, param, store):
+    self.rule = rule
+    self.never = False # a precondition that can't hold in any hypothesis
+
+    # bool preconditions: (known & reqMask) == reqMask and (value & reqMask) == reqValue
+    self.reqMask = np.zeros( store.numWords, dtype=np.uint64 )
+    self.reqValue = np.zeros( store.numWords, dtype=np.uint64 )
+    # cat preconditions: cat[:, catCols] == catCodes
+    catCols = []
+    catCodes = []
+    # function preconditions, in their original order: (func, val)
+    self.funcs = []
+    # names of the predicates read by the bool / cat preconditions
+    self.reads = []
+
+    for pred in rule.precondPreds:
+      if pred.predType == 'fromFunc':
+        self.funcs += [ (pred.func, pred.val) ]
+        continue
+      predName = pred.name(param)
+      self.reads += [predName]
+      if pred.predType == 'fromPred':
+        expected = pred.val
+      else:
+        expected = param[ pred.param_val ]
+
+      if store.isBool(predName):
+        if expected is True or expected is False or expected in (0, 1):
+          (w, bit) = store.bitOf(predName)
+          if self.reqMask[w] & bit and bool(self.reqValue[w] & bit) != bool(expected):
+            self.never = True
+          self.reqMask[w] |= bit
+          if expected:
+            self.reqValue[w] |= bit
+        else:
+          self.never = True
+      else:
+        catCols += [ store.catIndex[predName] ]
+        catCodes += [ store.encode( store.catIndex[predName], expected ) ]
+        if catCodes[-1] == UNKNOWN:
+          self.never = True
+
+    self.catCols = np.array( catCols, dtype=int )
+    self.catCodes = np.array( catCodes, dtype=np.int32 )
+
+    # effects that can be resolved now: (target kind, target, source kind, source)
+    # effects that depend on parameters set by the functions (e.g. obj_held) are resolved per hypothesis
+    self.staticEffects = []
+    self.dynamicEffects = []
+    for pred in rule.effectPreds:
+      keys = [ pred.obj ]
+      if pred.predType == 'fromPred':
+        keys += [ pred.otherObj ]
+      elif pred.predType == 'fromParam':
+        keys += [ pred.param_val ]
+      if not all( key in param for key in keys ):
+        self.dynamicEffects += [ pred ]
+        continue
+
+      predName = str(param[pred.obj]) + "." + pred.pred
+      if pred.predType == 'fromPred':
+        otherPredName = str(param[pred.otherObj]) + "." + pred.otherPred
+        if store.isBool(predName) != store.isBool(otherPredName):
+          # copying between a bool and a cat predicate needs decoding, do it per hypothesis
+          self.dynamicEffects += [ pred ]
+          continue
+        self.staticEffects += [ ( predName, 'copy', otherPredName ) ]
+      elif pred.predType == 'fromVal':
+        self.staticEffects += [ ( predName, 'value', pred.val ) ]
+      elif pred.predType == 'fromParam':
+        self.staticEffects += [ ( predName, 'value', param[pred.param_val] ) ]
+
+    # resolve static effects into bits / codes
+    self.effectPlan = []
+    for (predName, sourceKind, source) in self.staticEffects:
+      if store.isBool(predName):
+        target = ( 'bool', store.bitOf(predName) )
+      else:
+        target = ( 'cat', store.catIndex[predName] )
+      if sourceKind == 'copy':
+        if store.isBool(source):
+          self.effectPlan += [ ( target, 'copy', store.bitOf(source) ) ]
+        else:
+          self.effectPlan += [ ( target, 'copy', store.catIndex[source] ) ]
+      elif target[0] == 'bool':
+        if source is None or pd.isnull(source):
+          self.effectPlan += [ ( target, 'unknown', None ) ]
+        else:
+          self.effectPlan += [ ( target, 'value', bool(source) ) ]
+      else:
+        self.effectPlan += [ ( target, 'value', store.encode( target[1], source ) ) ]
+
+  def staticMask(self, known, value, cat):
+    # rows where all bool and cat preconditions hold
+    if self.never:
+      return np.zeros( known.shape[0], dtype=bool )
+    mask = ( (known & self.reqMask) == self.reqMask ).all(axis=1) & ( (value & self.reqMask) == self.reqValue ).all(axis=1)
+    if len(self.catCols) != 0:
+      mask &= ( cat[:, self.catCols] == self.catCodes ).all(axis=1)
+    return mask
+
+  def funcsHold(self, rowParam, row):
+    for (func, val) in self.funcs:
+      if not func(rowParam, row) == val:
+        return False
+    return True
+
+  def applyStatic(self, newKnown, newValue, newCat, mask, known, value, cat):
+    # write the static effects into the rows in mask of newKnown, newValue, newCat;
+    # known, value, cat are the hypotheses before the action
+    for (target, sourceKind, source) in self.effectPlan:
+      if target[0] == 'bool':
+        (w, bit) = target[1]
+        if sourceKind == 'copy':
+          (sw, sbit) = source
+          srcKnown = (known[mask, sw] & sbit) != 0
+          srcValue = (value[mask, sw] & sbit) != 0
+          newKnown[mask, w] = np.where( srcKnown, newKnown[mask, w] | bit, newKnown[mask, w] & ~bit )
+          newValue[mask, w] = np.where( srcKnown & srcValue, newValue[mask, w] | bit, newValue[mask, w] & ~bit )
+        elif sourceKind == 'unknown':
+          newKnown[mask, w] &= ~bit
+          newValue[mask, w] &= ~bit
+        else:
+          newKnown[mask, w] |= bit
+          if source:
+            newValue[mask, w] |= bit
+          else:
+            newValue[mask, w] &= ~bit
+      else:
+        j = target[1]
+        if sourceKind == 'copy':
+          newCat[mask, j] = cat[mask, source]
+        else:
+          newCat[mask, j] = source
+
+
+class CompiledAction:
+  def __init__(self, action, param, store):
+    self.action = action
+    self.name = action.name
+    self.param = dict(param)
+    self.rules = [ rule.compile(param, store) for rule in action.rules ]
+    # what the workers of a pool know this plan by, see runFuncsParallel
+    self.planId = next(PLAN_IDS)
+
+    # what sufficiency analysis needs: the predicates read by bool / cat preconditions, and the function preconditions
+    self.reads = []
+    self.funcs = []
+    for rule in self.rules:
+      for predName in rule.reads:
+        if predName not in self.reads:
+          self.reads += [predName]
+      for (func, val) in rule.funcs:
+        if func not in self.funcs:
+          self.funcs += [func]
+
+    # the predicates the functions read, as bits and columns; None if some function doesn't declare them
+    funcPreds = []
+    for func in self.funcs:
+      preds = declaredPreds(func, 'reads', param, store)
+      if preds is None:
+        funcPreds = None
+        break
+      funcPreds += [ predName for predName in preds if predName not in funcPreds ]
+    self.funcBits = None
+    self.funcCols = None
+    if funcPreds is not None:
+      self.funcBits = [ store.bitOf(predName) for predName in funcPreds if store.isBool(predName) ]
+      self.funcCols = np.array( [ store.catIndex[predName] for predName in funcPreds if not store.isBool(predName) ], dtype=int )
+
+    # sufficiency: the predicates that have to be known to decide the preconditions, those of the bool / cat
+    # preconditions and those the functions declare they need. bool ones as a mask of bits, cat ones as columns.
+    # functions that don't declare what they need check it themselves, per hypothesis
+    needPreds = list(self.reads)
+    self.undeclaredFuncs = []
+    for func in self.funcs:
+      preds = declaredPreds(func, 'needs', param, store)
+      if preds is None:
+        self.undeclaredFuncs += [func]
+        continue
+      needPreds += [ predName for predName in preds if predName not in needPreds ]
+    self.needMask = np.zeros( store.numWords, dtype=np.uint64 )
+    self.needCatPreds = []
+    for predName in needPreds:
+      if store.isBool(predName):
+        (w, bit) = store.bitOf(predName)
+        self.needMask[w] |= bit
+      else:
+        self.needCatPreds += [predName]
+    self.needCols = np.array( [ store.catIndex[predName] for predName in self.needCatPreds ], dtype=int )
+
+  def missing(self, store):
+    # sufficiency analysis of all hypotheses at once. returns the (hypotheses x words) bits of the unknown bool
+    # predicates that the preconditions need, and the needed cat predicates unknown in some hypothesis, which
+    # can't be split on. functions that don't declare what they need report their own, per hypothesis
+    missing = self.needMask & ~store.known
+    unknown = ( store.cat[:, self.needCols] == UNKNOWN ).any(axis=0)
+    unknownCats = [ self.needCatPreds[k] for k in np.flatnonzero(unknown) ]
+    for func in self.undeclaredFuncs:
+      for index in range( store.numHyp() ):
+        (isSuff, funcPreds) = func( self.param, store.row(index), True )
+        for predName in ( [] if isSuff else funcPreds ):
+          if store.isBool(predName):
+            (w, bit) = store.bitOf(predName)
+            missing[index, w] |= bit
+          elif predName not in unknownCats:
+            unknownCats += [predName]
+    return (missing, unknownCats)
+
+  def activations(self, store, numWorkers = 1, pool = None):
+    # evaluate the preconditions of every rule on every hypothesis. pool is a ProcessPoolExecutor of numWorkers
+    # workers to reuse; without one, a pool is started for the call if the functions run in parallel.
+    # returns a (rules x hypotheses) bool array, and the per-hypothesis parameter copies the functions ran with
+    masks = np.zeros( ( len(self.rules), store.numHyp() ), dtype=bool )
+    for i, rule in enumerate(self.rules):
+      masks[i] = rule.staticMask( store.known, store.value, store.cat )
+
+    # the rows some function precondition still has to run on
+    funcRules = [ i for i, rule in enumerate(self.rules) if len(rule.funcs) != 0 ]
+    candidates = np.flatnonzero( masks[funcRules].any(axis=0) )
+    runOn = candidates
+    if self.funcBits is not None and len(candidates) > 1:
+      # rows with the same masks and the same values of the predicates the functions read get the same results:
+      # run the functions on the first row of each group
+      key = self.funcKey( store, masks[funcRules], candidates )
+      (_, first, groups) = np.unique( key, axis=0, return_index=True, return_inverse=True )
+      runOn = candidates[first]
+
+    if numWorkers > 1 and len(runOn) >= PARALLEL_MIN_ROWS:
+      if pool is not None:
+        rowParams = self.runFuncsParallel( store, masks, runOn, numWorkers, pool )
+      else:
+        with ProcessPoolExecutor(numWorkers) as pool:
+          rowParams = self.runFuncsParallel( store, masks, runOn, numWorkers, pool )
+    else:
+      rows = ( ( index, store.row(index) ) for index in runOn )
+      rowParams = self.runFuncs( rows, masks )
+
+    if len(runOn) != len(candidates):
+      # the rest of each group takes the masks and parameter copy of its first row; the copy is only read from now on
+      source = runOn[ groups.reshape(-1) ]
+      for i in funcRules:
+        masks[i, candidates] = masks[i, source]
+      rowParams = { index: rowParams[sourceIndex] for (index, sourceIndex) in zip( candidates.tolist(), source.tolist() ) }
+    return (masks, rowParams)
+
+  def funcKey(self, store, funcMasks, candidates):
+    # a row per candidate: the masks of the rules with functions, then known / value of every bool and the code of
+    # every cat predicate the functions read
+    columns = [ funcMasks[:, candidates].T ]
+    for (w, bit) in self.funcBits:
+      columns += [ ( store.known[candidates, w] & bit ) != 0, ( store.value[candidates, w] & bit ) != 0 ]
+    key = np.column_stack( [ column.astype(np.int32) for column in columns ] )
+    return np.column_stack( ( key, store.cat[np.ix_( candidates, self.funcCols )] ) )
+
+  def runFuncs(self, rows, masks):
+    # rows are (column of masks, row) pairs; clears the masks of the rules whose functions don't hold.
+    # the rules of a row share one parameter copy, in rule order; returns {column: parameter copy}
+    rowParams = {}
+    for (index, row) in rows:
+      rowParam = dict(self.param)
+      rowParams[index] = rowParam
+      for i, rule in enumerate(self.rules):
+        if len(rule.funcs) != 0 and masks[i, index]:
+          masks[i, index] = rule.funcsHold( rowParam, row )
+    return rowParams
+
+  def runFuncsParallel(self, store, masks, candidates, numWorkers, pool):
+    # runFuncs over shards of the candidate rows in a process pool. this action and an empty copy of the store to
+    # decode rows with are pickled and sent along the first time the pool gets them; after that only their keys
+    # go with the rows. a worker that doesn't have them yet sends its shard back and gets it again with them
+    shards = [ shard for shard in np.array_split( candidates, numWorkers * SHARDS_PER_WORKER ) if len(shard) != 0 ]
+    if len(shards) == 0:
+      return {}
+    shipped = SHIPPED.setdefault( pool, set() )
+    planKey = ( 'plan', self.planId )
+    schemaKey = ( 'schema', id(store), store.schemaVersion, tuple( len(codebook) for codebook in store.codebooks ) )
+    payload = {}
+    def send(shard, keys):
+      for key in keys:
+        if key not in payload:
+          payload[key] = pickle.dumps( self if key == planKey else store.emptyCopy(), protocol=pickle.HIGHEST_PROTOCOL )
+      task = ( planKey, schemaKey, { key: payload[key] for key in keys } )
+      return pool.submit( workerFuncs, task, store.known[shard], store.value[shard], store.cat[shard], masks[:, shard] )
+
+    newKeys = [ key for key in (planKey, schemaKey) if key not in shipped ]
+    jobs = [ ( shard, send(shard, newKeys) ) for shard in shards ]
+    shipped.update(newKeys)
+    rowParams = {}
+    while len(jobs) != 0:
+      missed = []
+      for (shard, job) in jobs:
+        result = job.result()
+        if result is None:
+          missed += [ ( shard, send( shard, (planKey, schemaKey) ) ) ]
+          continue
+        (shardMasks, shardParams) = result
+        masks[:, shard] = shardMasks
+        for (k, rowParam) in shardParams.items():
+          rowParams[ shard[k] ] = rowParam
+      jobs = missed
+    return rowParams
+
+  def apply(self, store, masks, rowParams):
+    # apply the effects of the activated rules; all rules see the hypotheses as they were before the action
+    known = store.known
+    value = store.value
+    cat = store.cat
+
+    # effects resolved per hypothesis are computed before anything is written
+    dynamicChanges = []
+    for i, rule in enumerate(self.rules):
+      changes = []
+      if len(rule.dynamicEffects) != 0:
+        for index in np.flatnonzero(masks[i]):
+          row = store.row(index)
+          rowParam = rowParams.get(index, self.param)
+          for pred in rule.dynamicEffects:
+            changes += [ ( index, ) + pred.apply(rowParam, row) ]
+      dynamicChanges += [changes]
+
+    # effects are written into a copy, then only the touched rows are written back into the store
+    newKnown = known.copy()
+    newValue = value.copy()
+    newCat = cat.copy()
+    for i, rule in enumerate(self.rules):
+      if masks[i].any():
+        rule.applyStatic( newKnown, newValue, newCat, masks[i], known, value, cat )
+      for (index, predName, val) in dynamicChanges[i]:
+        store.setIn( newKnown, newValue, newCat, index, predName, val )
+
+    touched = np.flatnonzero( masks.any(axis=0) )
+    store.writeRows( touched, newKnown[touched], newValue[touched], newCat[touched] )
+
+  def evaluate(self, store, numWorkers = 1, pool = None):
+    # activations + apply; returns the activation masks
+    (masks, rowParams) = self.activations(store, numWorkers, pool)
+    self.apply(store, masks, rowParams)
+    return masks
+
+
+def declaredPreds(func, attribute, param, store):
+  # the predicates of the store a function precondition declares as func.<attribute>:
+  #   reads  the predicates it reads; hypotheses that agree on them get the same result
+  #   needs  the predicates that must be known for it to decide; others it reads may be unknown
+  # [ "<parameter>.<predicate>" ], or "*.<predicate>" for the predicate of every object. None if not declared
+  patterns = getattr(func, attribute, None)
+  if patterns is None:
+    return None
+  res = []
+  for pattern in patterns:
+    (obj, pred) = pattern.split('.', 1)
+    if obj == '*':
+      res += [ predName for predName in store.preds if predName.endswith( '.' + pred ) ]
+    elif str(param[obj]) + '.' + pred in store.preds:
+      res += [ str(param[obj]) + '.' + pred ]
+  return res
+
+
+# ids of the compiled actions, for the workers; the keys of the plans and schemas sent to the workers of each pool
+PLAN_IDS = itertools.count()
+SHIPPED = weakref.WeakKeyDictionary()
+# the plans and schemas a pool worker has been sent, by key, the least recently used dropped past WORKER_KEEPS
+WORKER_KEEPS = 256
+worker = OrderedDict()
+
+def workerFuncs(task, known, value, cat, masks):
+  # runFuncs on a shard; masks and the returned parameter copies are indexed by position in the shard.
+  # returns None if the worker doesn't have the plan or the schema of the task and they didn't come with it
+  (planKey, schemaKey, payload) = task
+  for (key, data) in payload.items():
+    worker[key] = pickle.loads(data)
+  for key in (planKey, schemaKey):
+    if key not in worker:
+      return None
+    worker.move_to_end(key)
+  while len(worker) > WORKER_KEEPS:
+    worker.popitem(last=False)
+  schema = worker[schemaKey]
+  rows = ( ( k, schema.decodeRow( known[k], value[k], cat[k] ) ) for k in range( masks.shape[1] ) )
+  rowParams = worker[planKey].runFuncs( rows, masks )
+  return (masks, rowParams)
+
+
+class PlanCache:
+  # LRU cache of compiled actions, keyed by (action name, parameters, schema version of the store)
+  def __init__(self, maxSize = 128):
+    self.maxSize = maxSize
+    self.plans = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, action, param, store):
+    try:
+      key = ( action.name, tuple(sorted( param.items() )), store.schemaVersion )
+      hash(key)
+    except TypeError:
+      # unhashable parameters, can't be cached
+      self.misses += 1
+      return action.compile(param, store)
+
+    plan = self.plans.get(key)
+    # two action models may use the same action name
+    if plan is not None and plan.action is action:
+      self.hits += 1
+      self.plans.move_to_end(key)
+      return plan
+
+    self.misses += 1
+    plan = action.compile(param, store)
+    self.plans[key] = plan
+    self.plans.move_to_end(key)
+    while len(self.plans) > self.maxSize:
+      self.plans.popitem(last=False)
+      self.evictions += 1
+    return plan
+
+  def clear(self):
+    self.plans.clear()
+
+  def stats(self):
+    return { 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.plans) }
@@ -0,0 +1,191 @@
+import os
+import ast
+import shutil
+import numpy as np
+from sim.util.snapshot import writeFile
+
+# the examples an ActionLearner has seen, as clauses of integer coded literals, append only.
+# a literal is stored as the id of its key (see Literal.key) in a vocabulary of keys. the preconditions and the
+# effects of all examples are two int32 columns, with the end offset of each example in two int64 columns.
+# with a path, the vocabulary and the columns are files in that directory and are read back through np.memmap,
+# so a learner can be reopened on more examples than fit in memory; without a path they are kept in memory.
+# examples are written in chunks: flush() (ActionLearner.close, Runner.close) before the process ends, or the last
+# ones are lost.
+
+VOCABULARY = 'literals.txt' # a repr of a literal key per line, line number = id
+COLUMNS = { 'preconds': np.int32, 'effects': np.int32, 'precondEnds': np.int64, 'effectEnds': np.int64 }
+
+
+def plain(value):
+  # numpy scalars -> python values, so that keys survive repr / ast.literal_eval
+  if isinstance(value, tuple):
+    return tuple( plain(v) for v in value )
+  if isinstance(value, np.generic):
+    return value.item()
+  return value
+
+
+def copyStore(source, path):
+  # make the directory path hold the examples of the store in the directory source, e.g. to go on appending to the
+  # examples of a snapshot somewhere else. files are copied aside and renamed, they may be mapped
+  if os.path.abspath(source) == os.path.abspath(path):
+    return
+  os.makedirs(path, exist_ok=True)
+  for fileName in [ VOCABULARY ] + [ name + '.bin' for name in COLUMNS ]:
+    target = os.path.join(path, fileName)
+    if os.path.exists( os.path.join(source, fileName) ):
+      with open( os.path.join(source, fileName), 'rb' ) as f:
+        writeFile( target, lambda out: shutil.copyfileobj(f, out) )
+    elif os.path.exists(target):
+      os.remove(target)
+
+
+class ExampleStore:
+  # examples are buffered and written out in chunks of this many
+  FLUSH_EVERY = 4096
+
+  def __init__(self, path = None):
+    self.path = path
+    self.keys = [] # id -> literal key
+    self.ids = {}  # literal key -> id
+    # written columns (memmaps with a path) and the examples not written yet: [ (precondIds, effectIds) ]
+    self.columns = { name: np.zeros( 0, dtype=dtype ) for name, dtype in COLUMNS.items() }
+    self.pending = []
+    self.numWritten = 0
+    self.pendingKeys = 0 # vocabulary entries not written yet
+
+    if path is not None:
+      os.makedirs(path, exist_ok=True)
+      if os.path.exists( os.path.join(path, VOCABULARY) ):
+        with open( os.path.join(path, VOCABULARY) ) as f:
+          for line in f:
+            self.addKey( ast.literal_eval(line) )
+        self.pendingKeys = 0
+      self.mapColumns()
+
+  def addKey(self, key):
+    self.ids[key] = len(self.keys)
+    self.keys += [key]
+    self.pendingKeys += 1
+    return self.ids[key]
+
+  def mapColumns(self):
+    for name, dtype in COLUMNS.items():
+      fileName = os.path.join( self.path, name + '.bin' )
+      if os.path.exists(fileName) and os.path.getsize(fileName) != 0:
+        self.columns[name] = np.memmap( fileName, dtype=dtype, mode='r' )
+      else:
+        self.columns[name] = np.zeros( 0, dtype=dtype )
+    # an interrupted write may leave the offsets of the last example out; it is then not part of the store
+    self.numWritten = min( len(self.columns['precondEnds']), len(self.columns['effectEnds']) )
+
+  # -----------------------------
+
+  def numExamples(self):
+    return self.numWritten + len(self.pending)
+
+  def __len__(self):
+    return self.numExamples()
+
+  def encode(self, key):
+    # numpy scalars hash and compare like the python values, only new keys need plain
+    if key in self.ids:
+      return self.ids[key]
+    return self.addKey( plain(key) )
+
+  def append(self, precondKeys, effectKeys):
+    # returns the index of the example
+    self.pending += [ ( np.array( [ self.encode(key) for key in precondKeys ], dtype=np.int32 ),
+                        np.array( [ self.encode(key) for key in effectKeys ], dtype=np.int32 ) ) ]
+    if len(self.pending) >= self.FLUSH_EVERY:
+      self.flush()
+    return self.numExamples()-1
+
+  def literalIds(self, index):
+    # ( precondition ids, effect ids ) of an example
+    if index >= self.numWritten:
+      return self.pending[ index - self.numWritten ]
+    ends = self.columns['precondEnds']
+    preconds = self.columns['preconds'][ ( ends[index-1] if index > 0 else 0 ) : ends[index] ]
+    ends = self.columns['effectEnds']
+    effects = self.columns['effects'][ ( ends[index-1] if index > 0 else 0 ) : ends[index] ]
+    return ( preconds, effects )
+
+  def literalKeys(self, index):
+    # ( precondition keys, effect keys ) of an example
+    ( preconds, effects ) = self.literalIds(index)
+    return ( [ self.keys[i] for i in preconds ], [ self.keys[i] for i in effects ] )
+
+  def effectKeys(self, index):
+    return [ self.keys[i] for i in self.literalIds(index)[1] ]
+
+  # -----------------------------
+
+  def flush(self):
+    # write the pending examples; the offsets go last, so an example is only there once all of it is
+    if len(self.pending) == 0:
+      return
+    newColumns = {}
+    for (name, endName, k) in ( ('preconds', 'precondEnds', 0), ('effects', 'effectEnds', 1) ):
+      start = int( self.columns[endName][self.numWritten-1] ) if self.numWritten > 0 else 0
+      lengths = np.array( [ len(example[k]) for example in self.pending ], dtype=np.int64 )
+      newColumns[name] = np.concatenate( [ example[k] for example in self.pending ] ).astype( COLUMNS[name] )
+      newColumns[endName] = start + np.cumsum(lengths)
+
+    if self.path is None:
+      for name in COLUMNS:
+        self.columns[name] = np.concatenate( [ self.columns[name][ :self.size(name) ], newColumns[name] ] )
+      self.numWritten += len(self.pending)
+    else:
+      if self.pendingKeys != 0:
+        with open( os.path.join(self.path, VOCABULARY), 'a' ) as f:
+          for key in self.keys[ len(self.keys) - self.pendingKeys: ]:
+            f.write( repr(key) + "\n" )
+      for name in COLUMNS:
+        self.truncate( name, self.size(name) )
+        with open( os.path.join(self.path, name + '.bin'), 'ab' ) as f:
+          f.write( newColumns[name].tobytes() )
+      self.mapColumns()
+    self.pendingKeys = 0
+    self.pending = []
+
+  def size(self, name):
+    # entries of a column that belong to the written examples
+    if self.numWritten == 0:
+      return 0
+    if name in ('precondEnds', 'effectEnds'):
+      return self.numWritten
+    return int( self.columns[ 'precondEnds' if name == 'preconds' else 'effectEnds' ][self.numWritten-1] )
+
+  def truncate(self, name, size):
+    # drop what an interrupted write left past the written examples
+    fileName = os.path.join( self.path, name + '.bin' )
+    if os.path.exists(fileName) and os.path.getsize(fileName) > size * np.dtype(COLUMNS[name]).itemsize:
+      self.columns[name] = np.zeros( 0, dtype=COLUMNS[name] )
+      with open(fileName, 'r+b') as f:
+        f.truncate( size * np.dtype(COLUMNS[name]).itemsize )
+
+  def save(self, path):
+    # all examples into the directory path, as an ExampleStore with that path would have them, e.g. for a snapshot
+    self.flush()
+    if path == self.path:
+      return
+    # written aside and renamed, the columns may be mapped from the files of an earlier save
+    os.makedirs(path, exist_ok=True)
+    writeFile( os.path.join(path, VOCABULARY), lambda f: f.write( "".join( repr(key) + "\n" for key in self.keys ).encode() ) )
+    for name in COLUMNS:
+      column = np.ascontiguousarray( self.columns[name][ :self.size(name) ] )
+      writeFile( os.path.join(path, name + '.bin'), lambda f: f.write( column.tobytes() ) )
+
+  def clear(self):
+    # drop all examples
+    self.pending = []
+    self.keys = []
+    self.ids = {}
+    self.pendingKeys = 0
+    self.columns = { name: np.zeros( 0, dtype=dtype ) for name, dtype in COLUMNS.items() }
+    self.numWritten = 0
+    if self.path is not None:
+      for fileName in [ VOCABULARY ] + [ name + '.bin' for name in COLUMNS ]:
+        if os.path.exists( os.path.join(self.path, fileName) ):
+          os.remove( os.path.join(self.path, fileName) )
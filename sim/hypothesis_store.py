@@ -0,0 +1,457 @@
+import numpy as np
+import pandas as pd
+import math
+import os
+from sim.util.occupancy import Occupancy, positionPreds
+from sim.util.snapshot import saveArray, loadArray, saveState, loadState
+
+# number of boolean predicates packed into a single word of a bitmask
+WORD_BITS = 64
+# categorical code of a predicate whose value is unknown
+UNKNOWN = -1
+
+
+class HypothesisRow(dict):
+  # a single hypothesis decoded into a {predicate: value} dictionary; unknown values are None.
+  # index mimics pd.Series.index, so that action model functions can iterate the predicates
+  # positions are the [ (object, position predicate) ] of the store the row was decoded from
+  positions = None
+  grid = None
+
+  @property
+  def index(self):
+    return list(self.keys())
+
+  def occupancy(self):
+    # the Occupancy of the row, built on first use; rows are not changed once decoded
+    if self.grid is None:
+      self.grid = Occupancy( self, self.positions if self.positions is not None else positionPreds( self.keys() ) )
+    return self.grid
+
+
+class HypothesisStore:
+  # each hypothesis is a pair of bitmasks over bool_preds (known, value), packed into WORD_BITS words,
+  # plus a row of integer codes over cat_preds (UNKNOWN when the value is not known)
+  def __init__(self, bool_pred_names, cat_pred_names):
+    self.bool_preds = list(bool_pred_names)
+    self.cat_preds = list(cat_pred_names)
+    self.preds = self.bool_preds + self.cat_preds
+
+    self.boolIndex = { pred: i for i, pred in enumerate(self.bool_preds) }
+    self.catIndex = { pred: j for j, pred in enumerate(self.cat_preds) }
+    # positions of the objects and the arm, for the occupancy of decoded rows
+    self.positions = positionPreds(self.cat_preds)
+    self.numWords = max( 1, int(math.ceil( len(self.bool_preds) / WORD_BITS )) )
+
+    self.known = np.zeros( (0, self.numWords), dtype=np.uint64 )
+    self.value = np.zeros( (0, self.numWords), dtype=np.uint64 )
+    self.cat = np.zeros( (0, len(self.cat_preds)), dtype=np.int32 )
+
+    # per categorical predicate: code -> value and value -> code; codes are never reassigned
+    self.codebooks = [ [] for _ in self.cat_preds ]
+    self.codes = [ {} for _ in self.cat_preds ]
+
+    # bumped whenever the columns or the codebooks are replaced (see load); anything resolved against the columns,
+    # bits or codes, is only valid for one version. codebooks only grow otherwise, existing codes stay valid
+    self.schemaVersion = 0
+
+    # the core is maintained incrementally from per-column counters as rows are added, pruned, merged or written:
+    # how many rows have a bool predicate known True / known False, and per cat predicate, how many rows have each code
+    self.trueCount = np.zeros( len(self.bool_preds), dtype=np.int64 )
+    self.falseCount = np.zeros( len(self.bool_preds), dtype=np.int64 )
+    self.catCounts = [ {} for _ in self.cat_preds ]
+    self.core = {} # predicate -> value
+
+  # -----------------------------
+  # schema
+
+  def isBool(self, pred):
+    return pred in self.boolIndex
+
+  def isCat(self, pred):
+    return pred in self.catIndex
+
+  def bitOf(self, pred):
+    # word index and the single-bit mask of a boolean predicate
+    i = self.boolIndex[pred]
+    return ( i // WORD_BITS, np.uint64(1) << np.uint64(i % WORD_BITS) )
+
+  def encode(self, j, value):
+    # categorical value -> code, extending the codebook if the value is new
+    if value is None or ( isinstance(value, float) and math.isnan(value) ):
+      return UNKNOWN
+    code = self.codes[j].get(value)
+    if code is None:
+      code = len(self.codebooks[j])
+      self.codebooks[j] += [value]
+      self.codes[j][value] = code
+    return code
+
+  def decode(self, j, code):
+    if code == UNKNOWN:
+      return None
+    return self.codebooks[j][code]
+
+  def toMask(self, words):
+    # a row of words -> a single python int bitmask
+    mask = 0
+    for k, word in enumerate(words):
+      mask |= int(word) << (WORD_BITS * k)
+    return mask
+
+  def fromMask(self, mask):
+    # a python int bitmask -> a row of words
+    words = np.zeros( self.numWords, dtype=np.uint64 )
+    for k in range(self.numWords):
+      words[k] = (mask >> (WORD_BITS * k)) & ((1 << WORD_BITS) - 1)
+    return words
+
+  # -----------------------------
+  # rows
+
+  def numHyp(self):
+    return self.known.shape[0]
+
+  def addEmptyRow(self):
+    self.appendRows( np.zeros( (1, self.numWords), dtype=np.uint64 ), np.zeros( (1, self.numWords), dtype=np.uint64 ),
+                     np.full( (1, len(self.cat_preds)), UNKNOWN, dtype=np.int32 ) )
+
+  def appendRows(self, known, value, cat):
+    self.countRows(known, value, cat, 1)
+    self.known = np.concatenate( (self.known, known) )
+    self.value = np.concatenate( (self.value, value) )
+    self.cat = np.concatenate( (self.cat, cat) )
+    self.updateCore()
+
+  def dropRows(self, indices):
+    if len(indices) == 0:
+      return
+    self.countRows( self.known[indices], self.value[indices], self.cat[indices], -1 )
+    self.known = np.delete( self.known, indices, axis=0 )
+    self.value = np.delete( self.value, indices, axis=0 )
+    self.cat = np.delete( self.cat, indices, axis=0 )
+    self.updateCore()
+
+  def keepRows(self, mask):
+    # keep only the rows flagged in a boolean mask
+    if mask.all():
+      return
+    self.countRows( self.known[~mask], self.value[~mask], self.cat[~mask], -1 )
+    self.known = self.known[mask]
+    self.value = self.value[mask]
+    self.cat = self.cat[mask]
+    self.updateCore()
+
+  def writeRows(self, indices, known, value, cat):
+    # overwrite the rows at indices
+    if len(indices) == 0:
+      return
+    self.countRows( self.known[indices], self.value[indices], self.cat[indices], -1 )
+    self.countRows( known, value, cat, 1 )
+    self.known[indices] = known
+    self.value[indices] = value
+    self.cat[indices] = cat
+    self.updateCore()
+
+  def expandRow(self, index, completions):
+    # one copy of a row per completion; a completion is a {bool predicate: value} dictionary.
+    # returns the copies as (known, value, cat), ready for appendRows
+    numCompletions = len(completions)
+    known = np.repeat( self.known[index:index+1], numCompletions, axis=0 )
+    value = np.repeat( self.value[index:index+1], numCompletions, axis=0 )
+    cat = np.repeat( self.cat[index:index+1], numCompletions, axis=0 )
+    for k, completion in enumerate(completions):
+      for pred in completion:
+        (w, bit) = self.bitOf(pred)
+        known[k, w] |= bit
+        if completion[pred]:
+          value[k, w] |= bit
+        else:
+          value[k, w] &= ~bit
+    return (known, value, cat)
+
+  def get(self, index, pred):
+    if pred in self.boolIndex:
+      (w, bit) = self.bitOf(pred)
+      if not self.known[index, w] & bit:
+        return None
+      return bool( self.value[index, w] & bit )
+    j = self.catIndex[pred]
+    return self.decode( j, self.cat[index, j] )
+
+  def set(self, index, pred, value):
+    self.countCell(index, pred, -1)
+    self.setIn(self.known, self.value, self.cat, index, pred, value)
+    self.countCell(index, pred, 1)
+    self.updateCoreColumn(pred)
+
+  def setIn(self, known, value, cat, index, pred, predValue):
+    # write a single value into (known, value, cat) arrays shaped like the store's; doesn't touch the counters
+    if pred in self.boolIndex:
+      (w, bit) = self.bitOf(pred)
+      if predValue is None or pd.isnull(predValue):
+        known[index, w] &= ~bit
+        value[index, w] &= ~bit
+      else:
+        known[index, w] |= bit
+        if predValue:
+          value[index, w] |= bit
+        else:
+          value[index, w] &= ~bit
+    else:
+      j = self.catIndex[pred]
+      cat[index, j] = self.encode(j, predValue)
+
+  def row(self, index):
+    return self.decodeRow( self.known[index], self.value[index], self.cat[index] )
+
+  def decodeRow(self, knownWords, valueWords, catCodes):
+    row = HypothesisRow()
+    row.positions = self.positions
+    known = self.toMask( knownWords )
+    value = self.toMask( valueWords )
+    for i, pred in enumerate(self.bool_preds):
+      if known >> i & 1:
+        row[pred] = bool( value >> i & 1 )
+      else:
+        row[pred] = None
+    for j, pred in enumerate(self.cat_preds):
+      row[pred] = self.decode( j, catCodes[j] )
+    return row
+
+  def emptyCopy(self):
+    # the same columns and codebooks with no rows, e.g. to decode rows somewhere else
+    store = HypothesisStore( self.bool_preds, self.cat_preds )
+    store.codebooks = [ list(codebook) for codebook in self.codebooks ]
+    store.codes = [ dict(codes) for codes in self.codes ]
+    store.schemaVersion = self.schemaVersion
+    return store
+
+  # -----------------------------
+  # observations
+
+  def encodeObservation(self, observations):
+    # observations is a dictionary; returns the bool part as (known, value) words and the cat part as (columns, codes)
+    obsKnown = np.zeros( self.numWords, dtype=np.uint64 )
+    obsValue = np.zeros( self.numWords, dtype=np.uint64 )
+    catCols = []
+    catCodes = []
+    for pred in observations:
+      value = observations[pred]
+      if pred in self.boolIndex:
+        if value is None or pd.isnull(value):
+          continue
+        (w, bit) = self.bitOf(pred)
+        obsKnown[w] |= bit
+        if value:
+          obsValue[w] |= bit
+      else:
+        j = self.catIndex[pred]
+        code = self.encode(j, value)
+        if code != UNKNOWN:
+          catCols += [j]
+          catCodes += [code]
+    return ( obsKnown, obsValue, np.array(catCols, dtype=int), np.array(catCodes, dtype=np.int32) )
+
+  def firstMismatch(self, mismatch, catCols, catMismatch):
+    # name of the first predicate flagged by a bool mismatch mask or a cat mismatch row
+    mask = self.toMask(mismatch)
+    if mask != 0:
+      return self.bool_preds[ (mask & -mask).bit_length() - 1 ]
+    return self.cat_preds[ catCols[ np.argmax(catMismatch) ] ]
+
+  def observe(self, observations):
+    # checks all hypotheses against the observations at once: inconsistent rows are pruned, unknowns are filled in.
+    # returns (index, predicate) of every pruned row, indices as they were before pruning
+    (obsKnown, obsValue, catCols, catCodes) = self.encodeObservation(observations)
+
+    # a row is inconsistent if a known value differs from the observed one
+    mismatch = self.known & obsKnown & (self.value ^ obsValue)
+    catRows = self.cat[:, catCols]
+    catMismatch = (catRows != UNKNOWN) & (catRows != catCodes)
+    consistent = ~( mismatch.any(axis=1) | catMismatch.any(axis=1) )
+
+    removed = []
+    for index in np.flatnonzero(~consistent):
+      removed += [ ( index, self.firstMismatch(mismatch[index], catCols, catMismatch[index]) ) ]
+
+    # prune, then fill in: for consistent rows, observed values either match or were unknown
+    self.keepRows(consistent)
+    self.value = (self.value & ~obsKnown) | obsValue
+    self.known |= obsKnown
+    if len(catCols) != 0:
+      self.cat[:, catCols] = catCodes
+
+    # every remaining row now has the observed values
+    n = self.numHyp()
+    observedBits = self.unpack( obsKnown[np.newaxis] )[0]
+    valueBits = self.unpack( obsValue[np.newaxis] )[0]
+    self.trueCount[observedBits] = np.where( valueBits[observedBits], n, 0 )
+    self.falseCount[observedBits] = np.where( valueBits[observedBits], 0, n )
+    for (j, code) in zip(catCols, catCodes):
+      self.catCounts[j] = { int(code): n }
+    self.updateCore()
+    return removed
+
+  # -----------------------------
+  # merging
+
+  def mergeRound(self):
+    # one round of Quine-McCluskey merging: two hypotheses with identical unknowns and categorical values whose
+    # bool values differ in exactly one predicate are replaced by one hypothesis where that predicate is unknown.
+    # rows are hashed into buckets by (unknowns, categorical values, number of true predicates);
+    # a row can only merge with a row from the adjacent bucket that has its value plus one extra bit.
+    # returns (number of removed rows, number of added rows)
+    groups = {}
+    for index in range(self.numHyp()):
+      known = self.toMask(self.known[index])
+      value = self.toMask(self.value[index])
+      group = groups.setdefault( (known, self.cat[index].tobytes()), {} )
+      bucket = group.setdefault( bin(value).count('1'), {} )
+      bucket.setdefault(value, []).append(index)
+
+    toBeRemoved = set()
+    toBeAdded = {} # (known, value, categorical values) -> a row with these categorical values
+    for (known, catKey), group in groups.items():
+      for popcount, bucket in group.items():
+        above = group.get(popcount + 1)
+        if above is None:
+          continue
+        for value, indices in bucket.items():
+          free = known & ~value
+          while free != 0:
+            bit = free & -free
+            free ^= bit
+            partners = above.get(value | bit)
+            if partners is not None:
+              toBeRemoved.update(indices)
+              toBeRemoved.update(partners)
+              toBeAdded[ (known & ~bit, value, catKey) ] = indices[0]
+
+    if len(toBeAdded) != 0:
+      known = np.array( [ self.fromMask(k) for (k, v, c) in toBeAdded ], dtype=np.uint64 )
+      value = np.array( [ self.fromMask(v) for (k, v, c) in toBeAdded ], dtype=np.uint64 )
+      cat = self.cat[ list(toBeAdded.values()) ]
+      self.dropRows( sorted(toBeRemoved) )
+      self.appendRows(known, value, cat)
+    return ( len(toBeRemoved), len(toBeAdded) )
+
+  # -----------------------------
+  # core: predicates with identical known values across all hypotheses
+
+  def unpack(self, words):
+    # rows of words -> (rows x bool_preds) bool array
+    octets = np.ascontiguousarray(words, dtype='<u8').view(np.uint8)
+    return np.unpackbits( octets, axis=1, bitorder='little' )[:, :len(self.bool_preds)].astype(bool)
+
+  def countRows(self, known, value, cat, sign):
+    # add (sign 1) or subtract (sign -1) rows from the per-column counters
+    if known.shape[0] == 0:
+      return
+    knownBits = self.unpack(known)
+    valueBits = self.unpack(value)
+    self.trueCount += sign * (knownBits & valueBits).sum(axis=0)
+    self.falseCount += sign * (knownBits & ~valueBits).sum(axis=0)
+    for j in range(len(self.cat_preds)):
+      (codes, counts) = np.unique( cat[:, j], return_counts=True )
+      for (code, count) in zip(codes, counts):
+        if code == UNKNOWN:
+          continue
+        total = self.catCounts[j].get(int(code), 0) + sign * int(count)
+        if total == 0:
+          del self.catCounts[j][int(code)]
+        else:
+          self.catCounts[j][int(code)] = total
+
+  def countCell(self, index, pred, sign):
+    value = self.get(index, pred)
+    if value is None:
+      return
+    if pred in self.boolIndex:
+      i = self.boolIndex[pred]
+      if value:
+        self.trueCount[i] += sign
+      else:
+        self.falseCount[i] += sign
+    else:
+      j = self.catIndex[pred]
+      code = int(self.cat[index, j])
+      total = self.catCounts[j].get(code, 0) + sign
+      if total == 0:
+        del self.catCounts[j][code]
+      else:
+        self.catCounts[j][code] = total
+
+  def updateCoreColumn(self, pred):
+    n = self.numHyp()
+    if pred in self.boolIndex:
+      i = self.boolIndex[pred]
+      isCore = n > 0 and ( self.trueCount[i] == n or self.falseCount[i] == n )
+      value = bool( self.trueCount[i] == n )
+    else:
+      j = self.catIndex[pred]
+      # a core column has the code of any of its rows - row 0 - in all of them
+      code = int(self.cat[0, j]) if n > 0 else UNKNOWN
+      isCore = code != UNKNOWN and self.catCounts[j].get(code, 0) == n
+      value = self.decode(j, code)
+    if isCore:
+      self.core[pred] = value
+    elif pred in self.core:
+      del self.core[pred]
+
+  def updateCore(self):
+    # the number of rows changed: any column may have entered or left the core; only the counters are consulted
+    n = self.numHyp()
+    self.core = {}
+    if n == 0:
+      return
+    for i in np.flatnonzero( (self.trueCount == n) | (self.falseCount == n) ):
+      self.core[ self.bool_preds[i] ] = bool( self.trueCount[i] == n )
+    for j, pred in enumerate(self.cat_preds):
+      code = int(self.cat[0, j])
+      if code != UNKNOWN and self.catCounts[j].get(code, 0) == n:
+        self.core[pred] = self.decode(j, code)
+
+  def findCore(self):
+    return list(self.core.keys())
+
+  def getCore(self):
+    return list(self.core.items())
+
+  # -----------------------------
+  # snapshots
+
+  def save(self, path):
+    # the rows as .npy files in the directory path, the schema, codebooks and counters pickled, see sim.util.snapshot
+    saveState( path, { 'bool_preds': self.bool_preds, 'cat_preds': self.cat_preds, 'codebooks': self.codebooks,
+                       'trueCount': self.trueCount, 'falseCount': self.falseCount, 'catCounts': self.catCounts } )
+    for name in ('known', 'value', 'cat'):
+      saveArray( os.path.join(path, name + '.npy'), getattr(self, name) )
+
+  def load(self, path):
+    # replace the columns and rows with a snapshot written by save. the rows are memory-mapped and only read as
+    # they are used; changes to them stay in memory
+    state = loadState(path)
+    schemaVersion = self.schemaVersion
+    self.__init__( state['bool_preds'], state['cat_preds'] )
+    self.codebooks = state['codebooks']
+    self.codes = [ { value: code for code, value in enumerate(codebook) } for codebook in self.codebooks ]
+    # codes follow the order values were first seen in, they differ between runs: a new schema
+    self.schemaVersion = schemaVersion + 1
+    self.trueCount = state['trueCount']
+    self.falseCount = state['falseCount']
+    self.catCounts = state['catCounts']
+    for name in ('known', 'value', 'cat'):
+      setattr( self, name, loadArray( os.path.join(path, name + '.npy') ) )
+    self.updateCore()
+
+  # -----------------------------
+  # debugging
+
+  def toDataFrame(self):
+    rows = [ self.row(index) for index in range(self.numHyp()) ]
+    df = pd.DataFrame( rows, columns = self.preds )
+    return df.fillna(value=np.nan)
+
+  def __repr__(self):
+    return self.toDataFrame().__repr__()
@@ -1,18 +1,39 @@
-import copy
 from termcolor import colored
 import numpy as np
 import pandas as pd 
 import math
+import os
 from sim.util.utils import ERROR, WARN, GOOD, INFO
+from sim.util.snapshot import saveState, loadState
+from sim.example_store import ExampleStore, copyStore
+from sim.util.bitmap import ExampleBitmap, exampleRange
+from sim.subsumption import matchLiteral, subsumes
+from sim.predicate_types import pred_types, pred_sources
+
+# name -> ( arity, term types )
+PRED_TYPES = { pred[0]: ( pred[1], pred[2:] ) for pred in pred_types }
 
 class ActionLearner:
-  def __init__(self, name, extraPreds):
+  def __init__(self, name, extraPreds, verbose = True, examplePath = None):
     self.name = name # action name
     self.extraPreds = extraPreds
     self.rules = []
-
-    self.exampleTuples = [] # tuples (s, a, s'); 
-    self.exampleClauses = []
+    self.verbose = verbose
+    # (name, positive) of an effect -> indices of the rules with a compatible effect, in rule order
+    self.effectIndex = {}
+
+    # clauses of the examples (s, a, s'), as integer coded literals; on disk in examplePath if there is one
+    self.examples = ExampleStore(examplePath)
+    # which examples have a precondition literal: literal id in the example store -> example indices,
+    # and (name, positive) -> example indices; used to narrow down the negatives a generalized rule may cover
+    self.precondIndex = {}
+    self.precondTypeIndex = {}
+    for exampleIndex in range( self.examples.numExamples() ):
+      self.indexPreconds(exampleIndex)
+    # memoized coverage checks: rule index -> ( rule version, { (example index, effect key): covered } )
+    self.coverage = {}
+    # state key -> how it is translated into a literal, see translateExample
+    self.translations = {}
     
   def addExtraPreds(self, state, actionParam):
     # state here is a dictionary
@@ -22,196 +43,118 @@ class ActionLearner:
         state[predName] = value
     return state
 
-  def maintainRelevantPreds(self, state, actionParam):
-    # TO DO: this is hacky, put more thought
-    # relevant predicates are: all predicats that are somehow conncted through a graph to our objects
-    relevantObjs = []
-    relevantPredInds = []
-    relevantPreds = []
-    i = 0
-    needAnotherRun = False
-
-    for predName in actionParam:
-      relevantObjs += [actionParam[predName]]
-
-    while i < len(state):
-      if i not in relevantPredInds:
-        objs = state[i].getAllObjs()
-        # check if it's in
-        isIn = False
-        for obj in objs:
-          if obj in relevantObjs:
-            isIn = True
-            break
-        if isIn:
-          relevantPredInds += [i]
-          for obj in objs:
-            if obj not in relevantObjs:
-              relevantObjs += [obj]
-              needAnotherRun = True
-      i+=1
-      if i == len(state) and needAnotherRun:
-        i = 0
-        needAnotherRun = False
-    for j in relevantPredInds:
-      relevantPreds += [ state[j] ]
-
-    return relevantPreds
+  def maintainRelevantPreds(self, state, actionParam, graph = None):
+    # relevant predicates are: all predicats that are somehow conncted through a graph to our objects.
+    # graph is a RelevanceGraph that has seen the state, built here if there is none
+    if graph is None:
+      graph = RelevanceGraph( [state] )
+    return graph.relevantPreds( state, actionParam )
 
   def translateExample( self, state, actionParam ):
-    # these are actually literals
+    # these are actually literals. each key of the state is translated as compiled by translationOf the first time
+    # it is seen, see pred_sources
     preds = []
     for predName in state:
-      sep = predName.find('.')
-      if sep != -1:
-        objName = int(predName[:sep])
-      pred = predName[sep+1:]
+      if predName not in self.translations:
+        self.translations[predName] = translationOf(predName)
+      translation = self.translations[predName]
+      if translation is None:
+        continue
+      ( name, positive, arity, sources ) = translation
       value = state[predName]
-
-      if pred in ('armEmpty', 'movable'):
-        # arity 1 predicates
-        term = Term( termType = 'obj', value = objName ) # generate the term
-        preds += [ Literal( positive = value, name = pred, arity = 1, terms = [ term ] ) ] 
-      elif pred == 'safe':
-        # arity 1 predicate
-        term = Term( termType = 'pos', value = actionParam['p'] ) # generate the term
-        preds += [ Literal( positive = value, name = pred, arity = 1, terms = [ term ] ) ] 
-
-      elif pred in ('pos', 'objectHeld', 'kinMove', 'kinPick', 'under'):
-        # arity 2 predicates
-        if pred == 'pos':
-          if objName == -1:
-            pred = 'conf'
-          term1 = Term( termType = 'obj', value = objName ) 
-          term2 = Term( termType = pred, value = value )
-          preds += [ Literal( positive = True, name = pred, arity = 2, terms = [ term1, term2 ] ) ]  
-        elif pred == 'objectHeld':
-          term1 = Term( termType = 'obj', value = objName )
-          if value == -1:
-            term2 = Term( termType = 'obj', value = None )
-          else:
-            term2 = Term( termType = 'obj', value = value )
-          preds += [ Literal( positive = True, name = pred, arity = 2, terms = [ term1, term2 ] ) ]  
-        elif pred == 'kinMove':
-          term1 = Term( termType = 'conf', value = actionParam['q1']) # generate the term
-          term2 = Term( termType = 'conf', value = actionParam['q2']) # generate the term
-          preds += [ Literal( positive = value, name = pred, arity = 2, terms = [ term1, term2 ] ) ]  
-        elif pred == 'kinPick':
-          term1 = Term( termType = 'conf', value = actionParam['q']) # generate the term
-          term2 = Term( termType = 'pos', value = actionParam['p']) # generate the term
-          preds += [ Literal( positive = value, name = pred, arity = 2, terms = [ term1, term2 ] ) ]  
-        elif pred == 'under':
-          # TO DO: current implementation of under is a hack
-          term1 = Term( termType = 'conf', value = value[0]) # generate the term
-          term2 = Term( termType = 'pos', value = value[1]) # generate the term
-          preds += [ Literal( positive = True, name = pred, arity = 2, terms = [ term1, term2 ] ) ]  
-
-    
-    # for pred in preds:
-      # print(pred)
-    # print("----------")
+      terms = []
+      for ( termType, source, arg ) in sources:
+        if source == 'term':
+          terms += [ arg ]
+        elif source == 'value':
+          terms += [ Term( termType = termType, value = value ) ]
+        elif source == 'element':
+          terms += [ Term( termType = termType, value = value[arg] ) ]
+        elif source == 'heldObject':
+          terms += [ Term( termType = termType, value = None if value == -1 else value ) ]
+        else:
+          terms += [ Term( termType = termType, value = actionParam[arg] ) ]
+      preds += [ Literal( positive = value if positive == 'value' else positive, name = name, arity = arity, terms = terms ) ]
     return preds
 
   def removeUnlessChanged(self, prevS, newS):
+    prevIndex = LiteralIndex(prevS)
     res = []
     for pred in newS:
-      isNew = True
-      for oldPred in prevS:
-        if pred.sameAs(oldPred):
-          isNew = False
-          break
-      if isNew:
+      if not prevIndex.contains(pred):
         res += [pred]
     return res
 
   def saveDataPoint(self, exampleTuple, exampleClause):
-    self.exampleTuples += [exampleTuple]
-    self.exampleClauses += [exampleClause]
-    return len(self.exampleTuples)-1
+    # only the clause is kept, the tuple it came from is not
+    return self.examples.append( [ literal.key() for literal in exampleClause.preconds ], [ literal.key() for literal in exampleClause.effects ] )
+
+  def indexPreconds(self, exampleIndex):
+    literalIds = set( self.examples.literalIds(exampleIndex)[0].tolist() )
+    for literalId in literalIds:
+      self.precondIndex.setdefault( literalId, [] ).append(exampleIndex)
+    for typeKey in set( ( self.examples.keys[i][1], self.examples.keys[i][0] ) for i in literalIds ):
+      self.precondTypeIndex.setdefault( typeKey, [] ).append(exampleIndex)
+
+  def getClause(self, exampleIndex):
+    # the clause of a stored example, with fresh literals
+    ( precondKeys, effectKeys ) = self.examples.literalKeys(exampleIndex)
+    return Clause( [ literalFromKey(key) for key in precondKeys ], [ literalFromKey(key) for key in effectKeys ] )
 
   def findCompatibleRule( self, effectLiteral ):
-    res = None
-    for i, rule in enumerate(self.rules):
-      for literal in rule.effects:
-        if effectLiteral.isCompatibleWith( literal ):
-          # type matched!
-          if res == None:
-            res = i
-          elif res == i:
-            ERROR( "SAME RULE, TWO PREDICATES, SAME TYPE: %s, %s\n%s" %( effectLiteral.name, str(effectLiteral.positive), rule.__repr__() ) )
-          else:
-            ERROR( "I HAVE TWO RULES WITH SAME LITERAL TYPE: %s, %s\n%s" %( effectLiteral.name, str(effectLiteral.positive), rule.__repr__() ) )
+    matches = self.effectIndex.get( effectLiteral.typeKey(), [] )
+    if len(matches) == 0:
+      return None
+    res = matches[0]
+    for i in matches[1:]:
+      if res == i:
+        ERROR( "SAME RULE, TWO PREDICATES, SAME TYPE: %s, %s\n%s" %( effectLiteral.name, str(effectLiteral.positive), self.rules[i].__repr__() ) )
+      else:
+        ERROR( "I HAVE TWO RULES WITH SAME LITERAL TYPE: %s, %s\n%s" %( effectLiteral.name, str(effectLiteral.positive), self.rules[i].__repr__() ) )
     return res
 
-  def checkIfClauseIsCoveredByTheRule(self, clauseEffectLiteral, clause, ruleIndex):
+  def checkIfClauseIsCoveredByTheRule(self, clauseEffectLiteral, clause, ruleIndex, exampleIndex = None):
+    # the effect of the rule must map to clauseEffectLiteral and the preconditions to preconditions of the clause,
+    # under the same substitution. Assumption is that clauses / rules have a single effect
+    return self.covers(ruleIndex, clause, exampleIndex, clauseEffectLiteral)
+
+  def covers(self, ruleIndex, clause = None, exampleIndex = None, effectLiteral = None):
+    # does the rule theta-subsume the clause (see sim/subsumption.py): its preconditions, and its effect as
+    # effectLiteral if there is one. results for stored examples are memoized by rule version and example index;
+    # without a clause, the clause of the example is read from the store unless the result is memoized
     rule = self.rules[ruleIndex]
-    # first, check the effects. Assumption is that clauses / rules have a single effect
-    # rule literal is supposed to be more general than the clause literal
-    if not rule.effects[0].isMoreGeneralThan( clauseEffectLiteral ):
-      return False
-
-    #next check the preconditions.
-    # TO DO: when checking the match, i need to consider the predicates not individually, but as a group.
-    for ruleLiteral in rule.preconds:
-      existsMatchingPrecond = False
-      for clauseLiteral in clause.preconds:
-        if ruleLiteral.isCompatibleWith(clauseLiteral):
-          if ruleLiteral.isMoreGeneralThan(clauseLiteral):
-            if existsMatchingPrecond == True:
-              # TO DO: fix this
-              WARN( "RULE GENERALITY: MUST CONSIDER TOGETHER, NOT SEPARATELY" )
-            existsMatchingPrecond = True
-      if not existsMatchingPrecond:
-        return False
-      # if loop is over - we found a matching precondition, we're good
-    
-    return True
+    if exampleIndex is not None:
+      key = ( exampleIndex, None if effectLiteral is None else effectLiteral.key() )
+      ( version, memo ) = self.coverage.get( ruleIndex, (None, None) )
+      if version != rule.version:
+        memo = {}
+        self.coverage[ruleIndex] = ( rule.version, memo )
+      if key in memo:
+        return memo[key]
+    if clause is None:
+      clause = self.getClause(exampleIndex)
+
+    binding = {}
+    if effectLiteral is not None:
+      binding = matchLiteral( rule.effects[0], effectLiteral, {} )
+    res = binding is not None and subsumes( rule.preconds, clause.getIndex(), binding )
+    if exampleIndex is not None:
+      memo[key] = res
+    return res
           
-  def nextVarName(self, varName):
-    if len(varName) == 1:
-      if ord(varName) == 90:
-        return 'A'
-      else:
-        return chr(ord(varName)+1)
-    else:
-      ERROR("NEXT VAR NAME BAD INPUT")
-      return
-
-    
   def generalizeRule( self, clauseEffectLiteral, clause, ruleIndex ):
-    
-    ruleVarRenaming = {}
-    clauseVarRenaming = {}
-
+    # replace the rule with the least general generalization of the rule and the clause: paired literals are
+    # anti-unified term by term with the table of the rule, see AntiUnifier
     rule = self.rules[ruleIndex]
-    varName = 'X'
-    while varName in rule.listOfVars:
-      varName = self.nextVarName(varName)
 
     # handle effects first
     ruleLiteral = rule.effects[0]
-    
-    if ruleLiteral.isCompatibleWith( clauseEffectLiteral ):
-      # if rule's literal is more general - we dont care; is rule's literal is not more general, we need fixing!
-      if not ruleLiteral.sameAs( clauseEffectLiteral ):
-        t1 = ruleLiteral.terms
-        t2 = clauseEffectLiteral.terms
-        for i in range(ruleLiteral.arity):
-          # not the same - replace
-          if not t1[i].sameAs(t2[i]):
-            if not( t1[i].value in ruleVarRenaming and t2[i].value in clauseVarRenaming ):
-              if (t1[i].value in ruleVarRenaming and t2[i].value not in clauseVarRenaming) or \
-                (t1[i].value not in ruleVarRenaming and t2[i].value in clauseVarRenaming):
-                # error handling / unknown case
-                ERROR("ONE VALUE IN VAR RENAMING, ANOTHER NOT %s %s %s %s %s %s" %(t1[i].__repr__(), t2[i].__repr__(), ruleLiteral.__repr__(), clauseLiteral.__repr__(), rule.__repr__(), clause.__repr__() ) )
-              else:
-                # introducing new variable
-                ruleVarRenaming[ t1[i].value ] = varName
-                clauseVarRenaming[ t2[i].value ] = varName
-                varName = self.nextVarName(varName)
-    else:
+    if not ruleLiteral.isCompatibleWith( clauseEffectLiteral ):
       ERROR( "INCOMPATIBLE EFFECTS IN GENERALIZATION\nCLAUSE %sRULE %s" %(clause, rule) )
       return
+    rule.lgg.newExample()
+    # if rule's literal is more general - it comes out the same
+    effects = [ rule.lgg.generalizeLiteral( ruleLiteral, clauseEffectLiteral ) ] + rule.effects[1:]
 
     # TO DO: so the issue here is the problem of predicate association.
     # association should be done based on relevance - action-object-predicate locality
@@ -226,7 +169,7 @@ class ActionLearner:
 
     ruleI = 0
     clauseI = 0
-    toBeRemoved = []
+    preconds = []
     while ruleI < len(rule.preconds):
       if clauseI >= len(clause.preconds):
         ERROR("iteration of clause screw up")
@@ -236,64 +179,31 @@ class ActionLearner:
       # same type - great!
       if ruleLiteral.isSameType( clauseLiteral ):
         if ruleLiteral.isCompatibleWith( clauseLiteral ):
-          if ruleLiteral.sameAs(clauseLiteral):
-            # beautiful, this is good, they are the same, go on
-            ruleI += 1
-            clauseI += 1
-          else:
-            # i = 0
-            t1 = ruleLiteral.terms
-            t2 = clauseLiteral.terms
-            for i in range(ruleLiteral.arity):
-              # not the same - replace
-              if not t1[i].sameAs(t2[i]):
-                if not (t1[i].value in ruleVarRenaming and t2[i].value in clauseVarRenaming):
-                  if (t1[i].value in ruleVarRenaming and t2[i].value not in clauseVarRenaming) or \
-                    (t1[i].value not in ruleVarRenaming and t2[i].value in clauseVarRenaming):
-                    # error handling / unknown case
-                    ERROR("ONE VALUE IN VAR RENAMING, ANOTHER NOT %s %s %s %s %s %s" %(t1[i].__repr__(), t2[i].__repr__(), ruleLiteral.__repr__(), clauseLiteral.__repr__(), rule.__repr__(), clause.__repr__() ) )
-                  else:
-                    # introducing new variable
-                    ruleVarRenaming[ t1[i].value ] = varName
-                    clauseVarRenaming[ t2[i].value ] = varName
-                    rule.listOfVars += [varName]
-                    varName = self.nextVarName(varName)
-            ruleI += 1
-            clauseI += 1
-
-        else:
-          # same type, not compatible - removal
-          toBeRemoved += [ruleI]
-          ruleI += 1
-          clauseI += 1
+          # the same if they are the same, otherwise differing terms are made into variables
+          preconds += [ rule.lgg.generalizeLiteral( ruleLiteral, clauseLiteral ) ]
+        # same type, not compatible - removal
+        ruleI += 1
+        clauseI += 1
       else:
         clauseI += 1
 
-    # remove predicates that needed to be removed:
-    newPrecond = []
-    for i in range(len(rule.preconds)):
-      if i not in toBeRemoved:
-        newPrecond += [ rule.preconds[i] ]
-    rule.preconds = newPrecond
-
-    # rename preconds
-    for pred in rule.preconds:
-      for term in pred.terms:
-        if term.value in ruleVarRenaming:
-          term.makeVariable( ruleVarRenaming[term.value] )
-    # rename effects
-    for pred in rule.effects:
-      for term in pred.terms:
-        if term.value in ruleVarRenaming:
-          term.makeVariable( ruleVarRenaming[term.value] )
+    # literals are interned: a rule that covers the clause already comes out as the same literals
+    if preconds == rule.preconds and effects == rule.effects:
+      return
+    rule.preconds = preconds
+    rule.effects = effects
+    rule.index = None
+    # coverage memoized for the rule before this is stale
+    rule.version += 1
+    rule.listOfVars = sorted( set( term.value for pred in preconds + effects for term in pred.terms if term.isVariable() ) )
 
     # print("----------------------------")
     # GOOD(rule)
 
 
-  def addExample(self, exampleTuple):
+  def preprocessExample(self, exampleTuple):
     # ------------------------------------------------------------
-    # FIRST: input processing
+    # FIRST: input processing; returns the index of the saved example and its clause
     (prevS_untr, actionParam, actionParamTypes, newS_untr) = exampleTuple
     # add more predicates
     prevS_untr = self.addExtraPreds(prevS_untr, actionParam)
@@ -302,8 +212,9 @@ class ActionLearner:
     newS = self.translateExample(newS_untr, actionParam)
     # only relevant preds are maintained
 
-    prevS = self.maintainRelevantPreds(prevS, actionParam)
-    newS = self.maintainRelevantPreds(newS, actionParam)
+    graph = RelevanceGraph( [prevS, newS] )
+    prevS = self.maintainRelevantPreds(prevS, actionParam, graph)
+    newS = self.maintainRelevantPreds(newS, actionParam, graph)
     
     # remove predicates that hasn't changed
     # TO DO: should first remove unless changed, than remove unrelated?
@@ -318,45 +229,214 @@ class ActionLearner:
     # print(exClause)
     # save this example
     exampleIndex = self.saveDataPoint(exampleTuple, exClause)
+    self.indexPreconds(exampleIndex)
+    return ( exampleIndex, exClause )
 
-    # return
-
-
+  def updateRules(self, effectPred, exClause, exampleIndex):
     # ------------------------------------------------------------
-    # SECOND: update existing rules
-    print("------------------------")
-    for effectPred in exClause.effects:
-      # per effect predicate: check if effect if there is a rule with an effect of the same type (positivity+name)
-      index = self.findCompatibleRule( effectPred )
-
-      # there isn't one - let's create one
-      if index == None:
-        self.createNewRule( effectPred, exClause )
+    # SECOND: update existing rules with an effect of an example
+    # returns what happened: 'new', 'positive' or 'generalized'
+    # per effect predicate: check if effect if there is a rule with an effect of the same type (positivity+name)
+    index = self.findCompatibleRule( effectPred )
+
+    # there isn't one - let's create one
+    if index == None:
+      self.createNewRule( effectPred, exClause, exampleIndex )
+      if self.verbose:
         GOOD( "ADDED A NEW CLAUSE RULE %s" %(self.rules[-1].effects[0].__repr__() ))
+      # the examples before it are negative for the new rule
+      self.verifyNegatives( len(self.rules)-1 )
+      return 'new'
+
+    # check if the clause is covered by this rule
+    # this entails, for each each predicate of the rule - both in effect and precondition - 
+    # checking that there is a compatible literal in the clause of same or higher specificity than that of the rule
+    isCovered = self.checkIfClauseIsCoveredByTheRule(effectPred, exClause, index, exampleIndex)
+    if isCovered:
+      # if covered - we don't have to do anything
+      if self.verbose:
+        GOOD("THIS IS A POSITIVE EXAMPLE FOR RULE %s!"%( self.rules[index].effects[0].__repr__() ))
+      self.rules[index].addPosExample(exampleIndex)
+      return 'positive'
+
+    if self.verbose:
+      WARN( "RULE %s MUST BE GENERALIZED" %(self.rules[index].effects[0].__repr__() ) )
+    self.generalizeRule( effectPred, exClause, index )
+    self.rules[index].addPosExample(exampleIndex)
+    # a more general rule may now cover negative examples it didn't before
+    self.verifyNegatives(index)
+    return 'generalized'
+
+    # we want to run lgg 
+    # compatible literals = same name, same negation status
+
+    # for each predicate in the rule: check to find if there is a compatible predicate in the clause
+    # if there is not - remove predicate from the rule
+    # if there is:
+    # if the two predicates are straight up the same - store them
+    # if the two predicates are not the same: find where they are not the same, save what is the same as is, what is not - make into variable.
+    # params can be made into variables; constants can be made into variables
+
+  def verifyNegatives(self, ruleIndex, candidates = None):
+    # check the negative examples of a rule (by default all of them) against its preconditions; the ones it covers
+    # are examples where the rule says its effect happens, but it didn't. they are recorded in E_minus_covered.
+    # candidates are first narrowed down to the examples that have every ground precondition of the rule and
+    # a literal of the type of every other precondition. returns the newly covered negatives
+    rule = self.rules[ruleIndex]
+    if candidates is None:
+      candidates = rule.E_minus
+    candidates = candidates - rule.E_minus_covered
+    for literal in rule.preconds:
+      if not candidates:
+        break
+      if literal.isGround():
+        examples = self.precondIndex.get( self.examples.ids.get( literal.key() ), [] )
       else:
-        # check if the clause is covered by this rule
-        # this entails, for each each predicate of the rule - both in effect and precondition - 
-        # checking that there is a compatible literal in the clause of same or higher specificity than that of the rule
-        isCovered = self.checkIfClauseIsCoveredByTheRule(effectPred, exClause, index)
-        if isCovered:
-          # if covered - we don't have to do anything
-          GOOD("THIS IS A POSITIVE EXAMPLE FOR RULE %s!"%( self.rules[index].effects[0].__repr__() ))
-          # TO DO: mark it as a positive example
-
-        else:
-          WARN( "RULE %s MUST BE GENERALIZED" %(self.rules[index].effects[0].__repr__() ) )
-          self.generalizeRule( effectPred, exClause, index )
-
-
-          # we want to run lgg 
-          # compatible literals = same name, same negation status
+        examples = self.precondTypeIndex.get( literal.typeKey(), [] )
+      candidates = candidates & ExampleBitmap(examples)
+
+    covered = ExampleBitmap()
+    for exampleIndex in candidates:
+      if self.covers( ruleIndex, exampleIndex = exampleIndex ):
+        covered.add(exampleIndex)
+        if self.verbose:
+          ERROR( "NEGATIVE EXAMPLE %i SATISFIES THE PRECONDITIONS OF RULE %s" %( exampleIndex, rule.effects[0].__repr__() ) )
+    rule.E_minus_covered = rule.E_minus_covered | covered
+    return covered
+
+  def addNegative(self, ruleIndex, exampleIndex, exClause):
+    # an example without the effect of the rule; the rule shouldn't cover it
+    rule = self.rules[ruleIndex]
+    rule.addNegExample(exampleIndex)
+    if self.covers(ruleIndex, exClause, exampleIndex):
+      rule.E_minus_covered.add(exampleIndex)
+      if self.verbose:
+        ERROR( "NEGATIVE EXAMPLE %i SATISFIES THE PRECONDITIONS OF RULE %s" %( exampleIndex, rule.effects[0].__repr__() ) )
 
-          # for each predicate in the rule: check to find if there is a compatible predicate in the clause
-          # if there is not - remove predicate from the rule
-          # if there is:
-          # if the two predicates are straight up the same - store them
-          # if the two predicates are not the same: find where they are not the same, save what is the same as is, what is not - make into variable.
-          # params can be made into variables; constants can be made into variables
+  def addExample(self, exampleTuple):
+    (exampleIndex, exClause) = self.preprocessExample(exampleTuple)
+    if self.verbose:
+      print("------------------------")
+    for effectPred in exClause.effects:
+      self.updateRules(effectPred, exClause, exampleIndex)
+    # the example is negative for the rules of the effects it doesn't have
+    effectTypes = set( effectPred.typeKey() for effectPred in exClause.effects )
+    for (typeKey, ruleIndices) in self.effectIndex.items():
+      if typeKey not in effectTypes:
+        for ruleIndex in ruleIndices:
+          self.addNegative(ruleIndex, exampleIndex, exClause)
+    if self.verbose:
+      self.printRules()
+
+  def addExamples(self, exampleTuples):
+    # batch version of addExample, e.g. for logged trajectories: all examples are preprocessed and stored first,
+    # then learnt from with learnFromExamples. the rules come out the same as with addExample, with a summary
+    # printed at the end instead of the rules after every example.
+    # returns the number of examples added
+    first = self.examples.numExamples()
+    verbose = self.verbose
+    self.verbose = False
+    try:
+      for exampleTuple in exampleTuples:
+        self.preprocessExample(exampleTuple)
+      summary = self.learnFromExamples( range( first, self.examples.numExamples() ) )
+    finally:
+      self.verbose = verbose
+    if self.verbose:
+      self.printSummary(summary)
+    return self.examples.numExamples() - first
+
+  def learnFromExamples(self, exampleIndices):
+    # the effects of the stored examples are grouped by type (name, positive); each group only ever touches the rule
+    # of its type, so the groups are run one after the other, each in example order. clauses are streamed back
+    # from the example store. returns a summary: counts of examples, effects, groups and outcomes
+    groups = {}
+    numExamples = 0
+    for exampleIndex in exampleIndices:
+      for (position, key) in enumerate( self.examples.effectKeys(exampleIndex) ):
+        groups.setdefault( literalFromKey(key).typeKey(), [] ).append( (exampleIndex, position) )
+      numExamples += 1
+
+    summary = { 'examples': numExamples, 'effects': sum( len(group) for group in groups.values() ), 'groups': len(groups),
+                'new': 0, 'positive': 0, 'generalized': 0, 'covered negatives': 0 }
+    for typeKey in groups:
+      for (exampleIndex, position) in groups[typeKey]:
+        exClause = self.getClause(exampleIndex)
+        summary[ self.updateRules(exClause.effects[position], exClause, exampleIndex) ] += 1
+
+    # the examples are negative for the rules of the effects they don't have. rules only get more general, so
+    # checking them against the final rule finds the same covered negatives as addExample does one by one
+    exampleIndices = ExampleBitmap(exampleIndices)
+    for (typeKey, ruleIndices) in self.effectIndex.items():
+      negatives = exampleIndices - ExampleBitmap( exampleIndex for (exampleIndex, _) in groups.get(typeKey, []) )
+      for ruleIndex in ruleIndices:
+        self.rules[ruleIndex].E_minus = self.rules[ruleIndex].E_minus | negatives
+        summary['covered negatives'] += len( self.verifyNegatives(ruleIndex, negatives) )
+    return summary
+
+  def printSummary(self, summary):
+    INFO( "ACTION %s: %i examples, %i effects in %i groups: %i new rules, %i positive, %i generalizations, %i covered negatives" %( self.name,
+          summary['examples'], summary['effects'], summary['groups'], summary['new'], summary['positive'], summary['generalized'], summary['covered negatives'] ) )
+    self.printRules()
+
+  def fit(self, dataset):
+    # learn the rules from scratch from an iterable of (s, a, a_types, s') tuples
+    self.rules = []
+    self.effectIndex = {}
+    self.examples.clear()
+    self.precondIndex = {}
+    self.precondTypeIndex = {}
+    self.coverage = {}
+    self.addExamples(dataset)
+    return self
+
+  def relearn(self):
+    # learn the rules from scratch from the stored examples, e.g. after reopening a learner on its examplePath
+    self.rules = []
+    self.effectIndex = {}
+    self.coverage = {}
+    verbose = self.verbose
+    self.verbose = False
+    try:
+      summary = self.learnFromExamples( range( self.examples.numExamples() ) )
+    finally:
+      self.verbose = verbose
+    if self.verbose:
+      self.printSummary(summary)
+    return self
+
+  def close(self):
+    # write the examples still buffered to the examplePath, so that a learner reopened on it sees all of them
+    self.examples.flush()
+
+  def snapshot(self, path):
+    # the rules, their example indices and the example store into the directory path, see sim.util.snapshot
+    self.examples.save( os.path.join(path, 'examples') )
+    saveState( path, { 'name': self.name, 'rules': self.rules, 'effectIndex': self.effectIndex,
+                       'precondIndex': self.precondIndex, 'precondTypeIndex': self.precondTypeIndex } )
+
+  def restore(self, path):
+    # the rules and examples of a snapshot, in place of the current ones; the snapshot is left as it is.
+    # a learner with an examplePath gets the examples of the snapshot copied there and goes on appending to them on
+    # disk. without one the examples are read from the snapshot, memory-mapped, and new ones are kept in memory
+    state = loadState(path)
+    if state['name'] != self.name:
+      ERROR( "ERROR: restoring a snapshot of %s into the learner of %s" %( state['name'], self.name ) )
+    examplePath = self.examples.path
+    if examplePath is not None:
+      copyStore( os.path.join(path, 'examples'), examplePath )
+      self.examples = ExampleStore(examplePath)
+    else:
+      self.examples = ExampleStore( os.path.join(path, 'examples') )
+      self.examples.path = None
+    self.rules = state['rules']
+    self.effectIndex = state['effectIndex']
+    self.precondIndex = state['precondIndex']
+    self.precondTypeIndex = state['precondTypeIndex']
+    self.coverage = {}
+    self.translations = {}
+
+  def printRules(self):
     INFO("------------------------")
     INFO("ACTION %s" %(self.name))
     INFO("------------------------")
@@ -440,17 +520,10 @@ class ActionLearner:
     #   self.createNewRules( notCoveredEffects, exClause )
 
   def findNotCoveredEffects(self, clause):
+    ruleEffects = LiteralIndex( [ effectPred for rule in self.rules for effectPred in rule.effects ] )
     notCovered = []
     for pred in clause.effects:
-      isCovered = False
-      for rule in self.rules:
-        for effectPred in rule.effects:
-          if pred.sameAs(effectPred):
-            isCovered = True
-            break
-        if isCovered:
-          break
-      if not isCovered:
+      if not ruleEffects.contains(pred):
         notCovered += [pred]
     return notCovered
 
@@ -458,11 +531,17 @@ class ActionLearner:
     for pred in notCovered:
       self.createNewRule( pred, exClause )
 
-  def createNewRule(self, effectLiteral, exClause):
-    # create a new rule
-    self.rules += [ Rule( copy.deepcopy(exClause.preconds), [effectLiteral] ) ]
-    # set positive examples for the new rule
-    self.rules[-1].setPosExamples( [ len( self.exampleTuples )-1 ], len( self.exampleTuples) )
+  def createNewRule(self, effectLiteral, exClause, exampleIndex = None):
+    # create a new rule from an example, by default the last one
+    if exampleIndex is None:
+      exampleIndex = self.examples.numExamples()-1
+    # literals are immutable, the rule shares them with the clause
+    self.rules += [ Rule( list(exClause.preconds), [effectLiteral] ) ]
+    # name and positivity of effects never change as rules are generalized
+    for literal in self.rules[-1].effects:
+      self.effectIndex.setdefault( literal.typeKey(), [] ).append( len(self.rules)-1 )
+    # set positive examples for the new rule; the examples before it are negative
+    self.rules[-1].setPosExamples( [ exampleIndex ], exampleIndex+1 )
     # GOOD( "ADDED A NEW CLAUSE RULE: \n%s------------------\n"%self.rules[-1].__repr__() )
 
 
@@ -470,11 +549,84 @@ class ActionLearner:
 
 
 
+class RelevanceGraph:
+  # objects (term values) are connected when they appear in a literal together; the connected components are
+  # kept with union-find, so the objects connected to the action parameters are found in one pass over the literals
+  def __init__(self, states):
+    self.parent = {}
+    for state in states:
+      for literal in state:
+        self.addLiteral(literal)
+
+  def find(self, obj):
+    root = obj
+    while self.parent[root] != root:
+      root = self.parent[root]
+    # path compression
+    while self.parent[obj] != root:
+      (self.parent[obj], obj) = (root, self.parent[obj])
+    return root
+
+  def addLiteral(self, literal):
+    objs = literal.getAllObjs()
+    for obj in objs:
+      if obj not in self.parent:
+        self.parent[obj] = obj
+    for obj in objs[1:]:
+      (a, b) = ( self.find(objs[0]), self.find(obj) )
+      if a != b:
+        self.parent[b] = a
+
+  def relevantPreds(self, state, actionParam):
+    # the literals of state with an object connected to an action parameter, in state order
+    roots = set()
+    for paramName in actionParam:
+      if actionParam[paramName] in self.parent:
+        roots.add( self.find( actionParam[paramName] ) )
+    relevantPreds = []
+    for literal in state:
+      for obj in literal.getAllObjs():
+        if self.find(obj) in roots:
+          relevantPreds += [literal]
+          break
+    return relevantPreds
+
+
+class LiteralIndex:
+  # literals by key (what sameAs compares) and by (name, positive) (what isCompatibleWith compares).
+  # literals are immutable, their keys can be taken once when they are added. a clause that gets new literals
+  # (insertParamsIntoPreds) needs a new index, see Clause.getIndex
+  def __init__(self, literals = []):
+    self.byKey = {}
+    self.byType = {}
+    for literal in literals:
+      self.add(literal)
+
+  def add(self, literal):
+    self.byKey.setdefault( literal.key(), [] ).append(literal)
+    self.byType.setdefault( literal.typeKey(), [] ).append(literal)
+
+  def contains(self, literal):
+    # is there a literal that is the same as this one
+    return literal.key() in self.byKey
+
+  def compatible(self, literal):
+    # literals compatible with this one, in the order they were added
+    return self.byType.get( literal.typeKey(), [] )
+
+
 class Clause:
   def __init__(self, preconds, effects):
     self.preconds = preconds
     self.effects = effects
     self.listOfVars = []
+    self.index = None # LiteralIndex of the preconditions, see getIndex
+
+  def getIndex(self):
+    # built once the clause is final; insertParamsIntoPreds drops it
+    if self.index is None:
+      self.index = LiteralIndex(self.preconds)
+    return self.index
 
   def __repr__(self):
     res = "CLAUSE, %i effects, %i preconds\nEFFECTS:\n"%(len(self.effects), len(self.preconds)) 
@@ -487,74 +639,161 @@ class Clause:
     return res
 
   def insertParamsIntoPreds(self, actionParam, actionParamTypes):
-    # action param is a dictionary
+    # action param is a dictionary; constants that are the value of a param become that param, the first one
+    # if there are several. literals are immutable, the ones with a param in them are replaced
+    self.index = None
+    params = {}
     for predName in actionParam:
-      predVal = actionParam[predName]
-      predType = actionParamTypes[predName]
-      for pred in self.preconds:
-        for term in pred.terms:
-          if term.isConstant() and term.type == predType and term.value == predVal:
-            term.makeParam(predName)
-      for pred in self.effects:
-        for term in pred.terms:
-          if term.isConstant() and term.type == predType and term.value == predVal:
-            term.makeParam(predName)
+      params.setdefault( ( actionParamTypes[predName], actionParam[predName] ), predName )
+    self.preconds = [ pred.withParams(params) for pred in self.preconds ]
+    self.effects = [ pred.withParams(params) for pred in self.effects ]
 
 class Rule(Clause):
   def __init__(self, preconds, effects):
     super().__init__( preconds, effects )
-    self.E_plus = []
-    self.E_minus = []
+    # indices of the positive and negative examples, and the negatives the rule covers (it shouldn't)
+    self.E_plus = ExampleBitmap()
+    self.E_minus = ExampleBitmap()
+    self.E_minus_covered = ExampleBitmap()
+    # bumped whenever the rule is generalized
+    self.version = 0
+    # pairs of terms -> variables, for generalizing the rule
+    self.lgg = AntiUnifier()
 
   def setPosExamples( self, Eplus, totalLen ):
-    self.E_plus = Eplus
-    for i in range(totalLen):
-      if i not in Eplus:
-        self.E_minus += [i]
+    # Eplus are positive, all other examples before totalLen negative
+    self.E_plus = ExampleBitmap(Eplus)
+    self.E_minus = self.E_minus | ( exampleRange(totalLen) - self.E_plus )
   
   def addPosExample( self, index ):
-    self.E_plus += [index]
+    self.E_plus.add(index)
 
   def addNegExample( self, index ):
-    self.E_minus += [index]
+    self.E_minus.add(index)
 
   def checkIfExampleIsPositive( self, clause ):
     # check if the effects of the example clause are covered by the rule
     # this doesn't check preconditions
 
     # each effect of the rule must be covered; note that since we have 1 effect per rule, this should be just 1
+    clauseEffects = LiteralIndex(clause.effects)
     for effectPred in self.effects:
-      doesCover = False
-      for pred in clause.effects:
-        # found a predicate in a clause that is covered by the rule predicate
-        if pred.sameAs(effectPred):
-          doesCover = True
-          break
-      if not doesCover:
+      # a predicate in a clause that is covered by the rule predicate
+      if not clauseEffects.contains(effectPred):
         return False
     return True
 
   def checkIfClauseSatisfiesPreconds( self, clause ):
     # the clause must have each of the preconditions of the rule
 
+    clausePreconds = LiteralIndex(clause.preconds)
     for precondPred in self.preconds:
-      isCovered = False
-      for pred in clause.preconds:
-        # found a predicate in a clause that is covered by the rule predicate
-        if pred.sameAs(precondPred):
-          isCovered = True
-          break
-      if not isCovered:
+      # a predicate in a clause that is covered by the rule predicate
+      if not clausePreconds.contains(precondPred):
         return False
     return True
 
 
 
+# names of the variables of a rule: X, Y, Z, A, ..., W, then X1, Y1, ...
+VARIABLE_NAMES = 'XYZABCDEFGHIJKLMNOPQRSTUVW'
+
+def variableName(i):
+  if i < len(VARIABLE_NAMES):
+    return VARIABLE_NAMES[i]
+  return VARIABLE_NAMES[ i % len(VARIABLE_NAMES) ] + str( i // len(VARIABLE_NAMES) )
+
+
+class AntiUnifier:
+  # anti-unification table of a rule. the rule is the lgg of its positive examples: a variable stands for the
+  # terms found in its place in each of them. generalizing with a new example pairs terms of the rule with terms of
+  # the example; a pair of different terms is a variable, the same one wherever the pair occurs. a variable of the
+  # rule keeps its name for the first term it is paired with, others get a new variable.
+  # the table is extended pair by pair as literals are paired. pairs are only valid for one example: after it,
+  # the variables of the rule stand for one more term each, and a pair kept for the next example could give two
+  # different pairs of it the same variable; newExample starts over. the name counter is kept, so names are never
+  # scanned for nor reused
+  def __init__(self):
+    self.table = {} # ( rule term key, example term key ) -> variable name
+    self.kept = set() # variables of the rule that kept their name for this example
+    self.numNames = 0
+
+  def newExample(self):
+    self.table = {}
+    self.kept = set()
+
+  def newVariable(self):
+    self.numNames += 1
+    return variableName( self.numNames-1 )
+
+  def generalizeTerm(self, ruleTerm, exampleTerm):
+    if ruleTerm.sameAs(exampleTerm):
+      return ruleTerm
+    pair = ( ruleTerm.key(), exampleTerm.key() )
+    if pair not in self.table:
+      if ruleTerm.isVariable() and ruleTerm.value not in self.kept:
+        self.kept.add(ruleTerm.value)
+        self.table[pair] = ruleTerm.value
+      else:
+        self.table[pair] = self.newVariable()
+    return Term( termType = ruleTerm.type, value = self.table[pair], valueType = "variable" )
+
+  def generalizeLiteral(self, ruleLiteral, exampleLiteral):
+    # the lgg of two compatible literals; ruleLiteral itself if it is more general already
+    terms = [ self.generalizeTerm( ruleLiteral.terms[i], exampleLiteral.terms[i] ) for i in range(ruleLiteral.arity) ]
+    return Literal( positive = ruleLiteral.positive, name = ruleLiteral.name, arity = ruleLiteral.arity, terms = terms )
+
+
+# terms and literals are immutable values, interned: there is a single object per value. literals and clauses share
+# their terms, rules share literals with the clauses they come from, and sameAs is an identity check. they are made
+# with the class, e.g. Term( termType = 'obj', value = 0 ), which returns the existing object if there is one.
+# like the vocabulary of an ExampleStore, the tables keep every value seen, until resetInterned drops those no rule
+# refers to any more. values are made python values and keyed with their type, see internValue: True and 1, or
+# (True, 0) and (1, 0), are different terms, while np.int64(1) and 1 are the same one
+TERMS = {}    # ( type, valueType, value key ) -> Term, see internValue
+LITERALS = {} # ( positive key, name, arity, terms ) -> Literal
+
+def internValue(value):
+  # ( the value with numpy scalars made python values, its key in the tables ). ints, strings and None are their own
+  # key; other values, e.g. True that is equal to 1, are keyed with their type
+  valueType = type(value)
+  if valueType is int or valueType is str or value is None:
+    return ( value, value )
+  if valueType is tuple:
+    if all( type(v) is int for v in value ):
+      return ( value, value )
+    pairs = [ internValue(v) for v in value ]
+    return ( tuple( v for (v, _) in pairs ), tuple( key for (_, key) in pairs ) )
+  if isinstance(value, np.generic):
+    return internValue( value.item() )
+  return ( value, ( valueType, value ) )
+
+def resetInterned(learners):
+  # empty the tables, then put back the terms and literals of the rules of the learners, e.g. after restoring
+  # them: the ones of the rules they replaced are dropped. the learners given must be all those still in use; a
+  # rule of another one keeps literals that are no longer sameAs the ones made after this
+  TERMS.clear()
+  LITERALS.clear()
+  for learner in learners:
+    learner.translations = {}
+    for rule in learner.rules:
+      for literal in rule.preconds + rule.effects:
+        for term in literal.terms:
+          TERMS[ ( term.type, term.valueType, internValue(term.value)[1] ) ] = term
+        LITERALS[ ( internValue(literal.positive)[1], literal.name, literal.arity, literal.terms ) ] = literal
+
 class Predicate:
-  def __init__(self, name, arity, terms):
-    self.name = name # armEmpty, pos, movable, etc
-    self.arity = arity 
-    self.terms = terms # terms: pos, obj, etc
+  __slots__ = ( 'name', 'arity', 'terms' )
+
+  def __new__(cls, name, arity, terms):
+    pred = object.__new__(cls)
+    object.__setattr__( pred, 'name', name ) # armEmpty, pos, movable, etc
+    object.__setattr__( pred, 'arity', arity )
+    object.__setattr__( pred, 'terms', tuple(terms) ) # terms: pos, obj, etc
+    return pred
+
+  def __setattr__(self, name, value):
+    raise AttributeError( "%s is immutable" %( type(self).__name__ ) )
 
   def __repr__(self):
     res = self.name + "("
@@ -577,27 +816,47 @@ class Predicate:
     return True
 
 class Atom(Predicate):
-  def __init__(self, name, arity, terms):
-    super().__init__( name, arity, terms )
+  __slots__ = ()
 
 class Literal(Atom):
-  def __init__(self, positive, name, arity, terms ):
-    self.positive = positive
-    super().__init__( name, arity, terms )
+  __slots__ = ( 'positive', 'keyValue' )
+
+  def __new__(cls, positive, name, arity, terms):
+    terms = tuple(terms)
+    ( positive, positiveKey ) = internValue(positive)
+    internKey = ( positiveKey, name, arity, terms )
+    literal = LITERALS.get(internKey)
+    if literal is None:
+      literal = super().__new__( cls, name, arity, terms )
+      object.__setattr__( literal, 'positive', positive )
+      object.__setattr__( literal, 'keyValue', ( positive, name, arity, tuple( term.key() for term in terms[:arity] ) ) )
+      LITERALS[internKey] = literal
+    return literal
+
+  def __reduce__(self):
+    # pickled and copied as a value, interned again when loaded
+    return ( Literal, ( self.positive, self.name, self.arity, self.terms ) )
 
   def __repr__(self):
     if self.positive:
       return "" + Predicate.__repr__(self)
     return "NOT " + Predicate.__repr__(self)
 
+  def key(self):
+    # equal keys <=> sameAs
+    return self.keyValue
+
+  def typeKey(self):
+    # equal type keys <=> isCompatibleWith
+    return ( self.name, self.positive )
+
   def sameAs(self, op):
-    if self.positive != op.positive or self.name != op.name or self.arity != op.arity:
-      return False
-    
-    for i in range( self.arity ):
-      if not self.terms[i].sameAs( op.terms[i] ):
-        return False
-    return True
+    return self is op
+
+  def withParams(self, params):
+    # the literal with its constants that are in params, { (type, value): param name }, made into params
+    terms = [ term.withParams(params) for term in self.terms ]
+    return Literal( positive = self.positive, name = self.name, arity = self.arity, terms = terms )
 
   def isCompatibleWith( self, op ):
     if self.positive == op.positive and self.name == op.name:
@@ -623,31 +882,78 @@ class Literal(Atom):
         return False
     return True
 
+def translationOf(stateKey):
+  # the translation of a state key into a literal, from pred_sources: ( name, positive, arity, [ (type, source, arg) ] ).
+  # the object of the key is made into its term here; other sources are 'value', 'element' (arg is the index),
+  # 'heldObject' and 'param' (arg is the parameter name). None if the key isn't translated
+  sep = stateKey.find('.')
+  entry = pred_sources.get( stateKey, pred_sources.get( stateKey[sep+1:] ) )
+  if entry is None:
+    return None
+  ( name, positive, sources ) = ( entry[0], entry[1], entry[2:] )
+  ( arity, types ) = PRED_TYPES[name]
+  if arity != len(sources):
+    ERROR( "PREDICATE %s HAS ARITY %i, %i TERM SOURCES" %( name, arity, len(sources) ) )
+    return None
+  terms = []
+  for ( termType, source ) in zip( types, sources ):
+    if source == 'object':
+      terms += [ ( termType, 'term', Term( termType = termType, value = int(stateKey[:sep]) ) ) ]
+    elif source.startswith('value.'):
+      terms += [ ( termType, 'element', int( source[len('value.'):] ) ) ]
+    elif source.startswith('param.'):
+      terms += [ ( termType, 'param', source[len('param.'):] ) ]
+    else:
+      terms += [ ( termType, source, None ) ]
+  return ( name, positive, arity, terms )
+
+def literalFromKey(key):
+  # a new Literal from Literal.key()
+  ( positive, name, arity, termKeys ) = key
+  return Literal( positive = positive, name = name, arity = arity, terms = [ termFromKey(termKey) for termKey in termKeys ] )
+
+def termFromKey(key):
+  # a new Term from Term.key()
+  ( termType, valueType, value ) = key
+  return Term( termType = termType, value = value, valueType = valueType )
+
+
 class Term:
-  def __init__(self, termType, value):
-    self.type = termType # i am dealing with typed objects: obj, pos, conf
-    self.valueType = "constant" # constants, parameters, variables. constants are more specific than parameters, more specific than variables
-    self.value = value
+  __slots__ = ( 'type', 'valueType', 'value' )
+
+  def __new__(cls, termType, value, valueType = "constant"):
+    ( value, valueKey ) = internValue(value)
+    internKey = ( termType, valueType, valueKey )
+    term = TERMS.get(internKey)
+    if term is None:
+      term = object.__new__(cls)
+      object.__setattr__( term, 'type', termType ) # i am dealing with typed objects: obj, pos, conf
+      object.__setattr__( term, 'valueType', valueType ) # constants, parameters, variables. constants are more specific than parameters, more specific than variables
+      object.__setattr__( term, 'value', value )
+      TERMS[internKey] = term
+    return term
+
+  def __setattr__(self, name, value):
+    raise AttributeError("Term is immutable")
+
+  def __reduce__(self):
+    return ( Term, ( self.type, self.value, self.valueType ) )
 
   def get(self):
     return self.value
 
+  def key(self):
+    # equal keys <=> sameAs, as the values of a term type are all of one python type
+    return ( self.type, self.valueType, self.value )
+
   def sameAs(self, term):
-    if self.type == term.type and self.valueType == term.valueType and self.value == term.value:
-      return True
-    return False
-      
-  def makeVariable(self, varName):
-    self.value = varName
-    self.valueType = "variable"
-
-  def makeParam(self, paramName):
-    self.value = paramName
-    self.valueType = "param"
-
-  def makeConstant(self, value):
-    self.value = varName
-    self.valueType = "constant"
+    return self is term
+
+  def withParams(self, params):
+    # the param this constant is the value of, if it is in params { (type, value): param name }
+    if self.valueType == "constant" and ( self.type, self.value ) in params:
+      return Term( termType = self.type, value = params[ ( self.type, self.value ) ], valueType = "param" )
+    return self
 
   def isConstant(self):
     return self.valueType == "constant"
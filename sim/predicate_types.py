@@ -1,6 +1,7 @@
 # ( name, arity, type1, type2, ... )
 pred_types = [
-  ( "pos", 2, "obj", "pos" ), 
+  ( "pos", 2, "obj", "pos" ),
+  ( "conf", 2, "obj", "conf" ),
   ( "objectHeld", 2, "obj", "obj" ),
 
   ( "armEmpty", 1, "obj" ),
@@ -9,8 +10,32 @@ pred_types = [
 
   ( "kinPick", 2, "conf", "pos" ),
   ( "kinMove", 2, "conf", "conf" ),
-  
-  
+  ( "under", 2, "conf", "pos" ),
+
+
   # ("Safe", , , )
-  # ("Under", , , )
-]
\ No newline at end of file
+]
+
+# how ActionLearner translates the predicates of a state, { "obj.pred": value }, into literals.
+# state predicate -> ( name, positive, source1, source2, ... ), a source per term; name is in pred_types, which has
+# the types of the terms. the state predicate is the key without its object, unless the whole key has an entry:
+# the arm, object -1, has a configuration where objects have a position. predicates not in here are left out.
+#   positive: "value" - the value of the predicate, a bool; True - the value is a term, the literal is positive
+#   sources:  "object"         the object of the key
+#             "value"          the value; "value.0", "value.1" an element of it
+#             "heldObject"     the value, an object, with -1 (nothing held) as None
+#             "param.<name>"   the action parameter <name>
+pred_sources = {
+  "pos":        ( "pos", True, "object", "value" ),
+  "-1.pos":     ( "conf", True, "object", "value" ),
+  "objectHeld": ( "objectHeld", True, "object", "heldObject" ),
+
+  "armEmpty":   ( "armEmpty", "value", "object" ),
+  "movable":    ( "movable", "value", "object" ),
+  "safe":       ( "safe", "value", "param.p" ),
+
+  "kinPick":    ( "kinPick", "value", "param.q", "param.p" ),
+  "kinMove":    ( "kinMove", "value", "param.q1", "param.q2" ),
+  # TO DO: current implementation of under is a hack
+  "under":      ( "under", True, "value.0", "value.1" ),
+}
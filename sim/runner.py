@@ -0,0 +1,246 @@
+import sys
+import os
+from sim.util.utils import ERROR
+from sim.util.specification_util import loadSpecification, processInputs
+from sim.util.commands import parseCommand, readCommands
+from sim.state_estimator import StateEstimator
+from sim.ilp import ActionLearner, resetInterned
+from sim.trajectory_log import TrajectoryLog, readHeader, readTrajectory
+from sim.util.snapshot import saveState, loadState
+from sim.specifications.simple.simple_correct_action_model import KinMovePred, KinPickPred, SafePred, UnderPred
+
+# drives the ground truth, the state estimator and the action learners through a trajectory of commands.
+# no GUI: Environment draws on top of a Runner, batch jobs use it directly:
+#   runner = Runner('simpleComplete')
+#   runner.runFile('trajectory.txt')
+# with a logPath the steps are appended to a trajectory log, see sim.trajectory_log; replay feeds one back to the
+# estimator and the learners without the ground truth. snapshot / restore save and load the ground truth, the
+# estimator and the learners, for a warm restart without running the trajectory again.
+
+
+class Runner:
+  def __init__(self, specification = 'simpleComplete', runEstimator = False, verbose = False, lazyBranching = False, numWorkers = 1, logPath = None):
+    # a specification name from sim.util.specification_util, or a dict as returned by loadSpecification
+    if isinstance(specification, str):
+      specification = loadSpecification(specification)
+    self.specification = specification
+    self.runEstimator = runEstimator
+    self.verbose = verbose
+
+    # ------------------
+    # process the input files
+    ( bool_preds, cat_preds, init_conds, observed_preds, observed_preds_first, num_objects ) = processInputs(
+      self.specification['initial_conditions'], self.specification['observed_predicates'], self.specification['observed_predicates_first'] )
+    self.gtActions = self.specification['gt_actions']
+    self.seActions = self.specification['se_actions']
+    self.observedPreds = observed_preds
+    self.numObjects = num_objects
+
+    # ------------------
+    # start the state estimators
+    self.gt = StateEstimator(bool_preds, cat_preds, False)
+    self.gt.observe(init_conds)
+
+    self.se = StateEstimator(bool_preds, cat_preds, verbose, runEstimator, lazyBranching, numWorkers = numWorkers)
+    self.se.observe( self.gtObserver(observed_preds_first), not runEstimator ) 
+
+    self.actionLearners = { 'move': ActionLearner( "move", [KinMovePred, UnderPred], verbose ), 
+                            'pick': ActionLearner( "pick", [KinPickPred], verbose ), 
+                            'place': ActionLearner( "place", [SafePred], verbose ) }
+
+    self.prevState = self.gtObserver()
+    self.numSteps = 0
+    self.log = TrajectoryLog( logPath, self.specification.get('name') ) if logPath is not None else None
+
+  def gtObserver(self, preds = []):
+    obs = {}
+    if len(preds) == 0:
+      for pred in self.observedPreds:
+        obs[pred] = self.gt.hyp.get(0, pred)
+    else:
+      for pred in preds:
+        obs[pred] = self.gt.hyp.get(0, pred)
+    return obs
+
+  def step(self, cmd, cmd2):
+    # apply a single command; returns False if the command is invalid
+    parsed = parseCommand(cmd, cmd2)
+    if parsed is None:
+      return False
+    ( param, learnerParam, learnerParamTypes ) = parsed
+
+    self.gt.applyAction( self.gtActions[cmd], param )
+    self.se.applyAction( self.seActions[cmd], param )
+
+    newState = self.gtObserver()
+    if self.log is not None:
+      self.log.append( self.prevState, cmd, param, learnerParam, learnerParamTypes, newState )
+    self.actionLearners[cmd].addExample( (self.prevState, learnerParam, learnerParamTypes, newState) )
+    self.prevState = self.gtObserver()
+    self.numSteps += 1
+
+    if self.gt.numHyp() > 1:
+      ERROR("--------------------------------------------------------")
+      ERROR("GROUND TRUTH has more than one hypothesis, this is wrong")
+      ERROR("--------------------------------------------------------")
+
+    self.filter( self.gtObserver() )
+    return True
+
+  def filter(self, observation):
+    # the estimator's side of a step after the action: take in the observation, drop the hypotheses it rules out
+    if self.runEstimator:
+      if self.verbose:
+        print("\nafter action")
+        print(self.se)
+
+      self.se.observe( observation ) 
+      if self.verbose:
+        print("\nafter observation")
+        print(self.se)
+
+      self.se.hypothesisRemoval()
+      if self.verbose:
+        print("\nafter hypremoval")
+        print(self.se)
+
+  def run(self, commands):
+    # commands is an iterable of (cmd, cmd2); returns the number of invalid commands
+    numInvalid = 0
+    for (cmd, cmd2) in commands:
+      if not self.step(cmd, cmd2):
+        ERROR("\tCommand invalid: %s %s" %(cmd, cmd2))
+        numInvalid += 1
+    return numInvalid
+
+  def runFile(self, path):
+    # a file with a command per line, see sim.util.commands
+    with open(path) as f:
+      return self.run( readCommands(f) )
+
+
+  def replay(self, path, chunkSize = 1024):
+    # feed the steps of a trajectory log to the estimator and the learners, as step does. the ground truth takes the
+    # logged actions too and is kept in agreement with the logged observations, so that live steps can follow.
+    # the log is streamed; the learners get their examples in chunks through addExamples.
+    # returns the number of steps
+    specification = readHeader(path).get('specification')
+    if specification is not None and specification != self.specification.get('name'):
+      ERROR( "ERROR: replaying a %s trajectory log with %s" %( specification, self.specification.get('name') ) )
+    examples = { name: [] for name in self.actionLearners }
+    numSteps = 0
+    mismatches = set()
+    for step in readTrajectory(path):
+      cmd = step['cmd']
+      mismatches.update( self.syncGroundTruth( step['prev'] ) )
+      self.gt.applyAction( self.gtActions[cmd], step['param'] )
+      mismatches.update( self.syncGroundTruth( step['next'] ) )
+      self.se.applyAction( self.seActions[cmd], step['param'] )
+      self.filter( step['next'] )
+      examples[cmd] += [ ( step['prev'], step['learnerParam'], step['types'], step['next'] ) ]
+      if len(examples[cmd]) >= chunkSize:
+        self.actionLearners[cmd].addExamples( examples[cmd] )
+        examples[cmd] = []
+      self.prevState = step['next']
+      self.numSteps += 1
+      numSteps += 1
+    for (cmd, chunk) in examples.items():
+      if len(chunk) != 0:
+        self.actionLearners[cmd].addExamples(chunk)
+    if len(mismatches) != 0:
+      ERROR( "ERROR: the ground truth disagreed with %s on %s, set from the log" %( path, sorted(mismatches) ) )
+    return numSteps
+
+  def syncGroundTruth(self, observation):
+    # set the predicates of the ground truth that disagree with an observation; returns them. they only disagree if
+    # the log wasn't recorded from this specification's initial state
+    mismatches = [ pred for pred in observation if self.gt.hyp.get(0, pred) != observation[pred] ]
+    for pred in mismatches:
+      self.gt.hyp.set( 0, pred, observation[pred] )
+    return mismatches
+
+  def close(self):
+    # shut down the process pools of the estimators, write out the examples of the learners and close the log
+    self.gt.close()
+    self.se.close()
+    for learner in self.actionLearners.values():
+      learner.close()
+    if self.log is not None:
+      self.log.close()
+
+  def snapshot(self, path):
+    # a directory with a snapshot of the ground truth, the estimator and each learner, see sim.util.snapshot
+    self.gt.snapshot( os.path.join(path, 'gt') )
+    self.se.snapshot( os.path.join(path, 'se') )
+    for (name, learner) in self.actionLearners.items():
+      learner.snapshot( os.path.join(path, 'learners', name) )
+    saveState( path, { 'specification': self.specification.get('name'), 'prevState': self.prevState, 'numSteps': self.numSteps } )
+
+  def restore(self, path):
+    state = loadState(path)
+    if state['specification'] != self.specification.get('name'):
+      ERROR( "ERROR: restoring a %s snapshot with %s" %( state['specification'], self.specification.get('name') ) )
+    self.gt.restore( os.path.join(path, 'gt') )
+    self.se.restore( os.path.join(path, 'se') )
+    for (name, learner) in self.actionLearners.items():
+      learner.restore( os.path.join(path, 'learners', name) )
+    # drop the terms and literals of the rules the snapshot replaced
+    resetInterned( self.actionLearners.values() )
+    self.prevState = state['prevState']
+    self.numSteps = state['numSteps']
+
+
+def main(argv):
+  # python3 -m sim.runner [-s specification] [-e] [-l] [-j workers] [-v] [-o log.jsonl] [-r snapshot] [-w snapshot]
+  #                       trajectory.txt|log.jsonl ...
+  # .jsonl paths are trajectory logs and are replayed; -o appends the steps of the trajectories run to a log.
+  # -r starts each run from a snapshot, -w writes one after each run, see Runner.snapshot
+  # returns 1 if any command was invalid, 0 otherwise
+  specification, runEstimator, lazyBranching, verbose, numWorkers, logPath = 'simpleComplete', False, False, False, 1, None
+  restorePath, snapshotPath = None, None
+  paths = []
+  i = 0
+  while i < len(argv):
+    if argv[i] == '-s':
+      i += 1
+      specification = argv[i]
+    elif argv[i] == '-e':
+      runEstimator = True
+    elif argv[i] == '-l':
+      lazyBranching = True
+    elif argv[i] == '-j':
+      i += 1
+      numWorkers = int(argv[i])
+    elif argv[i] == '-v':
+      verbose = True
+    elif argv[i] == '-o':
+      i += 1
+      logPath = argv[i]
+    elif argv[i] == '-r':
+      i += 1
+      restorePath = argv[i]
+    elif argv[i] == '-w':
+      i += 1
+      snapshotPath = argv[i]
+    else:
+      paths += [argv[i]]
+    i += 1
+
+  numInvalid = 0
+  for path in paths:
+    runner = Runner(specification, runEstimator, verbose, lazyBranching, numWorkers, None if path.endswith('.jsonl') else logPath)
+    if restorePath is not None:
+      runner.restore(restorePath)
+    if path.endswith('.jsonl'):
+      runner.replay(path)
+    else:
+      numInvalid += runner.runFile(path)
+    if snapshotPath is not None:
+      runner.snapshot(snapshotPath)
+    runner.close()
+    print("%s: %i steps, %i hypotheses" %(path, runner.numSteps, runner.se.numHyp()))
+  return 1 if numInvalid != 0 else 0
+
+
+if __name__ == '__main__':
+  sys.exit( main(sys.argv[1:]) )
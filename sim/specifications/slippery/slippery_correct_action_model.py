@@ -1,14 +1,16 @@
 from sim.state_estimator import Rule, ActionRuleBased
 from termcolor import colored
 import pandas as pd 
-from sim.util.action_model_util import negate, sum
+from sim.util.action_model_util import negate, sum, GRID
+from sim.util.occupancy import occupancy
 
 # for predicates, specify: 
 # cause actions are parametrized, remember
 
 # preconditions: 
 #   fromPred
-#   fromFunc
+#   fromFunc   ( func.reads lists the predicates func reads, func.needs those that must be known for it to
+#                decide: '<param>.<pred>', '*.<pred>' for every object; see sim.compiled_rules.declaredPreds )
 #   fromParam
 
 # effects:
@@ -25,6 +27,8 @@ def KinPick(param, hyp, sufficiencyCheck = False):
     if sum( param['q'], negate(param['p']) ) == (0,1):
       return True
     return False
+KinPick.reads = []
+KinPick.needs = []
 
 # rule 1: if arm is empty and kinematically possible to pick up an object - pick it up; ph and for slippery, the object can't be slippery either
 pick_rule1_precond = [ ( 'fromPred', 'arm', 'armEmpty', True ), ( 'fromPred', 'b', 'slippery', False ), ( 'fromParam', 'arm', 'pos', 'q' ), ( 'fromParam', 'b', 'pos', 'p' ), ('fromFunc', KinPick, True ) ]
@@ -45,20 +49,14 @@ pick_actionrb = ActionRuleBased( "pick", [pick_rule1, pick_rule2])
 def KinMove(param, hyp, sufficiencyCheck = False):
   # there are no obstacles in the way
   if sufficiencyCheck:
-    suff = True
-    insuffPreds = []
-    for pred in hyp.index:
-      if 'pos' in pred:
-        if pd.isnull( hyp[pred] ):
-          suff = False
-          insuffPreds += [pred]
+    # all positions should be identified
+    insuffPreds = list( occupancy(hyp).unknown )
 
     # sort of a strong requirement too
     for pred in [ str(param['arm']) + ".armEmpty", str(param['arm']) + ".objectHeld" ]:
       if pd.isnull(hyp[pred]):
-        suff = False
         insuffPreds += [pred]
-    return (suff, insuffPreds)
+    return (len(insuffPreds) == 0, insuffPreds)
   
   # checking translatory kinematic feasibility
   if not ( sum( param['q2'], negate(param['q1']) ) in ( (0,1), (0,-1), (1,0), (-1,0) ) ):
@@ -70,20 +68,22 @@ def KinMove(param, hyp, sufficiencyCheck = False):
     param['obj_held'] = hyp[ str(param['arm']) + ".objectHeld" ]
     param['obj_held_p2'] = (param['q2'][0], param['q2'][1]-1)
 
-  # no collisions
-  for pred in hyp.index: 
-    if 'pos' in pred and pred != str(param['arm']) + ".pos":
-      if hyp[ str(param['arm']) + ".armEmpty" ] or pred != str( hyp[ str(param['arm']) + ".objectHeld" ] ) + ".pos": # uhhm shady
-        for pos in desPos:
-          if hyp[pred] == pos:
-            return False
+  # no collisions: nothing but the arm and the object it holds in the cells it moves into
+  grid = occupancy(hyp)
+  held = None if hyp[ str(param['arm']) + ".armEmpty" ] else hyp[ str(param['arm']) + ".objectHeld" ]
+  for pos in desPos:
+    for obj in grid.objectsAt(pos):
+      if obj != param['arm'] and obj != held:
+        return False
 
   # within walls
   for pos in desPos:
-    if not ( 0 <= pos[0] < 9 and 0 <= pos[1] <= 3 ):
+    if not ( 0 <= pos[0] < GRID['width'] and 0 <= pos[1] < GRID['height'] ):
       return False
 
   return True
+KinMove.reads = [ '*.pos', 'arm.armEmpty', 'arm.objectHeld' ]
+KinMove.needs = [ '*.pos', 'arm.armEmpty', 'arm.objectHeld' ]
 
 # rule 1: if arm is movable and collision free in the direction of motion - move the arm
 move_rule1_precond = [ ( 'fromPred', 'arm', 'movable', True), ( 'fromParam', 'arm', 'pos', 'q1' ), ('fromFunc', KinMove, True) ]
@@ -103,36 +103,29 @@ move_actionrb = ActionRuleBased( "move_rel", [move_rule1, move_rule2])
 def Safe(param, hyp, sufficiencyCheck = False):
   # there is an obstacle underneath the held object
   if sufficiencyCheck:
-    suff = True
-    insuffPreds = []
     # all positions should be identified
-    for pred in hyp.index:
-      if 'pos' in pred:
-        if pd.isnull( hyp[pred] ):
-          suff = False
-          insuffPreds += [pred]
-    return (suff, insuffPreds)
+    unknown = occupancy(hyp).unknown
+    return (len(unknown) == 0, list(unknown))
 
   
   # within bounds
-  if not ( 0 <= param['p'][0] < 9 ):
+  if not ( 0 <= param['p'][0] < GRID['width'] ):
     return False
   # on the floor
   if param['p'][1] == 0:
     return True
+  grid = occupancy(hyp)
+  # check for a collision - to be honest, that's useless
+  for obj in grid.objectsAt( param['p'] ):
+    if obj != param['b']:
+      return False
   # there exists an object such that i am on top of it
-  objExists = False
-  for pred in hyp.index:
-    if 'pos' in pred:
-      # check for a collision - to be honest, that's useless
-      if hyp[pred] == param['p'] and int(pred[0]) != param['b']:
-        return False
-      if hyp[pred][0] == param['p'][0] and  hyp[pred][1] == param['p'][1] - 1:
-        objExists = True
-  if objExists:
+  if len( grid.objectsAt( (param['p'][0], param['p'][1] - 1) ) ) != 0:
     return True
 
   return False
+Safe.reads = [ '*.pos' ]
+Safe.needs = [ '*.pos' ]
 
 
 # rule 1: if arm is not empty and there is an object under neath - place it
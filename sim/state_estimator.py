@@ -4,6 +4,9 @@ import numpy as np
 import pandas as pd 
 import math
 from sim.util.utils import ERROR, WARN, GOOD
+from sim.hypothesis_store import HypothesisStore, HypothesisRow
+from sim.compiled_rules import CompiledRule, CompiledAction, PlanCache
+from concurrent.futures import ProcessPoolExecutor
 # https://pandas.pydata.org/pandas-docs/stable/user_guide/boolean.html
 
 class ActionRuleBased:
@@ -11,6 +14,10 @@ class ActionRuleBased:
     self.name = name # string
     self.rules = rules  # a list of rules
 
+  def compile(self, param, store):
+    # bind the parameters and resolve all predicates against the columns of a HypothesisStore
+    return CompiledAction(self, param, store)
+
 
 class EvalPredicate:
   def __init__(self, predSpec, precondOrEffect):
@@ -164,48 +171,51 @@ class Rule:
       changes += [ pred.apply(param, hyp) ]
     return changes
 
+  def compile(self, param, store):
+    # bind the parameters and resolve all predicates against the columns of a HypothesisStore
+    return CompiledRule(self, param, store)
+
 
 class StateEstimator:
-  def __init__(self, bool_pred_names, cat_pred_names, verbose = True, runEstimator = True):
+  def __init__(self, bool_pred_names, cat_pred_names, verbose = True, runEstimator = True, lazyBranching = False, planCacheSize = 128, numWorkers = 1):
     self.run = runEstimator
+    # lazy branching splits insufficient hypotheses only on the predicates rule activation depends on,
+    # instead of on every missing predicate
+    self.lazyBranching = lazyBranching
     self.bool_preds = bool_pred_names
     self.cat_preds = cat_pred_names
     self.preds = self.bool_preds + self.cat_preds
 
-    self.hyp = pd.DataFrame(columns = self.preds)
+    # hypotheses are kept as bitmasks over bool_preds + codes over cat_preds, see HypothesisStore
+    self.hyp = HypothesisStore(self.bool_preds, self.cat_preds)
     self.addEmptyRow()
     self.verbose = verbose
+
+    # compiled actions, reused while the same parameterised action recurs
+    self.planCache = PlanCache(planCacheSize)
+    # with more than one worker, rule functions are evaluated in a process pool once there are enough hypotheses.
+    # the pool is started on first use and reused by every action after; close shuts it down
+    self.numWorkers = numWorkers
+    self.pool = None
     
 
   def addEmptyRow(self):
-    self.hyp = self.hyp.append({}, ignore_index=True)
+    self.hyp.addEmptyRow()
 
   def numHyp(self):
-    return self.hyp.shape[0]
+    return self.hyp.numHyp()
 
   def observe(self, observations, forceObserve=False):
     if not self.run:
       if not forceObserve:
         return
     # observations is a dictionary
-    toBeRemoved = []
-    for index, row in self.hyp.iterrows():
-      for pred in observations:
-        # case 1: value not inited; just init it then
-        if pd.isnull(row[pred]):
-          self.hyp[pred].iat[index] = observations[pred]
-          if pred in self.bool_preds: # count
-            self.hyp[pred].iat[index] = observations[pred]
-        # case 2: value inited, but not the same; throw an error, should remove this row
-        elif row[pred] != observations[pred]:
-          if self.verbose:
-            WARN("OBSERVING MISMATCH in hypothesis %i: predicate %s didn't match observations"%(index,pred))
-          toBeRemoved += [index]
-          break
-
-    # remove some hypothesis
-    self.hyp.drop(toBeRemoved, inplace=True)
-    self.hyp.reset_index(drop=True, inplace=True)
+    # all hypotheses are checked at once: values that are not inited are inited,
+    # rows with an inited value that is not the same are removed
+    removed = self.hyp.observe(observations)
+    if self.verbose:
+      for (index, pred) in removed:
+        WARN("OBSERVING MISMATCH in hypothesis %i: predicate %s didn't match observations"%(index,pred))
 
     # we want to have at least 1 hypothesis
     if self.numHyp() == 0:
@@ -217,66 +227,122 @@ class StateEstimator:
   def applyAction(self, action, param):
     if not self.run:
       return
-    insufficient = []
+    # names are resolved once per (action, parameters), see PlanCache
+    plan = self.planCache.get(action, param, self.hyp)
     # -----------------------------------------
-    # FIRST: find rows with an insufficient hypothesis
-    for index, row in self.hyp.iterrows():
-      missing = []
-      for rule in action.rules:
-        for pred in rule.precondPreds:
-          (isSuff, insuffPreds) = pred.isSufficient(param, row)
-          if not isSuff:
-            for inPred in insuffPreds:
-              if inPred in self.bool_preds:
-                missing += [ inPred ]
-              else:
-                ERROR("ERROR: a categorial predicate %s is necessary but insufficient for the action %s" %(inPred, action.name))
-
-      if len(missing) > 0:
-        insufficient += [(index, np.unique(missing) )]  
+    # FIRST: find rows with an insufficient hypothesis, all rows at once
+    (missingBits, unknownCats) = plan.missing(self.hyp)
+    for inPred in unknownCats:
+      ERROR("ERROR: a categorial predicate %s is necessary but insufficient for the action %s" %(inPred, action.name))
+    insufficient = np.flatnonzero( missingBits.any(axis=1) )
 
     # -----------------------------------------
     # SECOND: add more hypothesi
     toBeRemoved = []
-    for (index, missing) in insufficient:
-      if self.verbose:
-        WARN("For hypothesis %i adding %s preds" %(index, str(missing)))
-      # all predicates in missing are bool
-      hypCopy = copy.deepcopy(self.hyp.iloc[index])
-
-      for m in missing:
-        hypCopy[m] = False
-      self.hyp = self.hyp.append(hypCopy, ignore_index=True)
-      # one by one add the hypothesi by iteratively changing boolean values of the hyp in a binary fashion
-      for i in range(1,2**len(missing)):
-        temp = 0
-        while hypCopy[ missing[temp] ]:
-          hypCopy[ missing[temp] ] = False
-          temp += 1
-        hypCopy[ missing[temp] ] = True
-        self.hyp = self.hyp.append(hypCopy, ignore_index=True)
+    for (index, bits) in zip( insufficient, self.hyp.unpack( missingBits[insufficient] ) ):
+      missing = sorted( self.hyp.bool_preds[i] for i in np.flatnonzero(bits) )
+      if self.lazyBranching:
+        completions = self.lazyCompletions(action, param, index)
+        if len(completions) == 1 and len(completions[0]) == 0:
+          # no rule depends on the missing predicates, the hypothesis stays as is
+          continue
+        if self.verbose:
+          WARN("For hypothesis %i splitting on %s preds into %i hypotheses" %(index, str(missing), len(completions)))
+      else:
+        if self.verbose:
+          WARN("For hypothesis %i adding %s preds" %(index, str(missing)))
+        # add the hypothesi by changing boolean values of the hyp in a binary fashion: completion k sets missing[b] to bit b of k
+        completions = [ { m: bool(k >> b & 1) for b, m in enumerate(missing) } for k in range(2**len(missing)) ]
+      (known, value, cat) = self.hyp.expandRow(index, completions)
+      self.hyp.appendRows(known, value, cat)
       toBeRemoved += [index]
     # drop the original hypothesi
-    self.hyp.drop(toBeRemoved, inplace=True)
-    self.hyp.reset_index(drop=True,inplace=True)
+    self.hyp.dropRows(toBeRemoved)
 
     # -----------------------------------------
     # THIRD: evaluate which rules are processed, process immediately
-    for index, row in self.hyp.iterrows():
-      activatedRules = []
+    # the compiled action is evaluated for all rows together
+    masks = plan.evaluate(self.hyp, self.numWorkers, self.workerPool())
+    if self.verbose:
       for i in range(len(action.rules)):
-        if self.verbose:
-          print("RULE " + str(i))
-        if action.rules[i].isActivated(param, row, self.verbose):
-          if self.verbose:
-            GOOD("\tRULE ACTIVATED")
-          activatedRules += [i]
-      
-      # activate the rules
-      for i in activatedRules:
-        changes = action.rules[i].apply(param, row)
-        for (pred, value) in changes:
-          self.hyp[pred].iat[index] = value
+        GOOD("RULE %i ACTIVATED in %i of %i hypotheses" %(i, masks[i].sum(), self.numHyp()))
+
+  def lazyCompletions(self, action, param, index):
+    # case-split a hypothesis only on the unknown bool predicates that decide whether some rule is activated;
+    # unknowns that no rule outcome depends on stay unknown.
+    # returns a list of completions - {bool predicate: value} dictionaries
+    row = self.hyp.row(index)
+    done = []
+    toBeSplit = [ {} ]
+    while len(toBeSplit) > 0:
+      completion = toBeSplit.pop()
+      partial = HypothesisRow(row)
+      partial.positions = row.positions
+      partial.update(completion)
+      pred = self.findDiscriminatingPred(action, param, partial)
+      if pred is None:
+        done += [completion]
+        continue
+      for value in (True, False):
+        split = dict(completion)
+        split[pred] = value
+        toBeSplit += [split]
+    return done
+
+  def findDiscriminatingPred(self, action, param, row):
+    # an unknown bool predicate that some rule still needs to decide its activation on this (partial) row, or None
+    for rule in action.rules:
+      missing = []
+      falsified = False
+      # a known precondition that fails deactivates the rule no matter what the unknowns are
+      for pred in rule.precondPreds:
+        if pred.predType == 'fromFunc':
+          continue
+        predName = pred.name(param)
+        if row[predName] is None:
+          if predName in self.bool_preds:
+            missing += [predName]
+          else:
+            ERROR("ERROR: a categorial predicate %s is necessary but insufficient for the action %s" %(predName, action.name))
+        elif not pred.isActivated(param, row):
+          falsified = True
+          break
+      if falsified:
+        continue
+      for pred in rule.precondPreds:
+        if pred.predType != 'fromFunc':
+          continue
+        (isSuff, insuffPreds) = pred.isSufficient(param, row)
+        if isSuff:
+          # functions may write into the parameters, evaluate on a copy
+          if not pred.isActivated(dict(param), row):
+            falsified = True
+            break
+        else:
+          for inPred in insuffPreds:
+            if inPred in self.bool_preds:
+              missing += [inPred]
+            else:
+              ERROR("ERROR: a categorial predicate %s is necessary but insufficient for the action %s" %(inPred, action.name))
+      if not falsified and len(missing) > 0:
+        return missing[0]
+    return None
+
+  def workerPool(self):
+    # the process pool of the estimator, None with a single worker. processes are only started once jobs come
+    if self.numWorkers > 1 and self.pool is None:
+      self.pool = ProcessPoolExecutor(self.numWorkers)
+    return self.pool
+
+  def close(self):
+    # shut the process pool down; it is started again if needed
+    if self.pool is not None:
+      self.pool.shutdown()
+      self.pool = None
+
+  def planCacheStats(self):
+    # hits, misses, evictions and size of the compiled action cache
+    return self.planCache.stats()
 
   def hypothesisRemoval(self):
     if not self.run:
@@ -285,89 +351,42 @@ class StateEstimator:
       continue
 
   def hypothesisRemovalSingleIteration(self):
-    toBeRemoved = []
-    toBeAdded = pd.DataFrame(columns = self.preds)
-    tempHyp = copy.deepcopy(self.hyp)
-
-    # fix NA into xorable NA
-    self.hyp.fillna(pd.NA, inplace = True)
-
-    for index1, row1 in self.hyp.iterrows():
-      for index2, row2 in self.hyp.iterrows():
-        if index1 < index2: # and row1[self.bool_preds].isna().sum() == row2[self.bool_preds].isna().sum() :
-          xored = pd.array( np.array(row1[self.bool_preds])^np.array(row2[self.bool_preds]), dtype='boolean')
-          if pd.isnull( row1[self.bool_preds] ).sum() == pd.isnull( row2[self.bool_preds] ).sum():
-            # number of nulls in the xor is the same as in the original
-            # hence the two rows have identical values in identical rows
-            if pd.Series(xored).sum() == 1:
-              # difference is only in one element - that means we can remove these rows and this element
-              toBeRemoved += [index1, index2]
-              xored = xored.fillna(False)
-              xored = ~xored
-              
-              addMe = row1[self.bool_preds][xored]
-
-              for pred in self.cat_preds:
-                addMe[pred] = row1[pred]
-              
-              for pred in self.bool_preds:
-                if pred not in addMe:
-                  addMe[pred] = math.nan
-              
-              toBeAdded = toBeAdded.append(addMe)
-
-    # remove duplicates
-    toBeAdded.drop_duplicates(inplace=True)
-                      
-    # remove old hypothsis
-    toBeRemoved = np.unique( np.array(toBeRemoved) )
-    self.hyp.drop(toBeRemoved, inplace=True)
-    if len(toBeRemoved) != 0 and self.verbose:
-      WARN("Removed %i hypotheses, added %i!"%(len(toBeRemoved), len(toBeAdded)))
-
-    # combine
-    self.hyp = self.hyp.append(toBeAdded)
-    self.hyp.reset_index(drop=True,inplace=True)
-    return len(toBeRemoved)
+    # merge pairs of hypotheses that differ in a single bool predicate, see HypothesisStore.mergeRound
+    (numRemoved, numAdded) = self.hyp.mergeRound()
+    if numRemoved != 0 and self.verbose:
+      WARN("Removed %i hypotheses, added %i!"%(numRemoved, numAdded))
+    return numRemoved
 
 
   def findCore(self):
-    core_preds = []
-    for col in self.hyp.columns:
-      if (self.hyp[col][0] == self.hyp[col]).all():
-        core_preds += [col]
-    return core_preds
+    return self.hyp.findCore()
 
   def getCore(self):
-    preds = self.findCore()
-    values = list(self.hyp.iloc[0][ preds ])
-    return [ (pred, value) for pred,value in zip(preds,values) ]
+    # the core is maintained by the store as hypotheses change, no rescan needed
+    return self.hyp.getCore()
+
+  def snapshot(self, path):
+    # the hypotheses into the directory path, see HypothesisStore.save
+    self.hyp.save(path)
+
+  def restore(self, path):
+    # the hypotheses of a snapshot, in place of the current ones. load bumps the schema version, so plans compiled
+    # against the old columns aren't used again; they are dropped to free them
+    self.hyp.load(path)
+    self.bool_preds = self.hyp.bool_preds
+    self.cat_preds = self.hyp.cat_preds
+    self.preds = self.bool_preds + self.cat_preds
+    self.planCache.clear()
+
+  def toDataFrame(self):
+    # the hypotheses as a pd.DataFrame, for debugging; unknown values are NaN
+    return self.hyp.toDataFrame()
   
   def __repr__(self):
     if not self.run:
       return ""
-    self.findCore()
     if self.verbose:
       return "Estimator with %i hypotheses, and the core of %s\n%s" % (\
               self.numHyp(), self.findCore(), self.hyp.__repr__() )
     else:
       return "\n"+self.hyp.__repr__()
-      
-
-                    
-
-
-
-
-
-
-        
-        
-
-      
-    
-
-
-
-
-
@@ -0,0 +1,81 @@
+# theta-subsumption: a rule covers a clause if there is a substitution theta of the variables of the rule such that
+# every literal of the rule, with theta applied, is a literal of the clause. variables of the rule are bound to
+# term keys (see Term.key) of the clause; terms of the clause are taken as they are, variables included.
+# the search binds one rule literal at a time to a clause literal, taking next the literal with the fewest candidates
+# left under the bindings so far (the most selective one). after each binding the candidates of the other literals
+# are filtered, and the search backtracks as soon as one of them has none left.
+
+
+def matchLiteral(ruleLiteral, clauseLiteral, binding):
+  # the bindings of the variables of ruleLiteral that turn it into clauseLiteral, consistent with binding; None if
+  # there are none. only the variables of ruleLiteral are in the result. the literals must be compatible
+  if ruleLiteral.arity != clauseLiteral.arity:
+    return None
+  res = {}
+  for i in range(ruleLiteral.arity):
+    ( ruleTerm, clauseTerm ) = ( ruleLiteral.terms[i], clauseLiteral.terms[i] )
+    if ruleTerm.type != clauseTerm.type:
+      return None
+    if ruleTerm.isVariable():
+      value = res.get( ruleTerm.value, binding.get(ruleTerm.value) )
+      if value is None:
+        res[ruleTerm.value] = clauseTerm.key()
+      elif value != clauseTerm.key():
+        return None
+      else:
+        res[ruleTerm.value] = value
+    elif not ruleTerm.sameAs(clauseTerm):
+      return None
+  return res
+
+
+def consistent(candidate, binding):
+  for var in candidate:
+    if var in binding and binding[var] != candidate[var]:
+      return False
+  return True
+
+
+def subsumes(ruleLiterals, clauseIndex, binding = {}):
+  # is there a substitution, extending binding, that maps every one of ruleLiterals to a literal of the clause.
+  # clauseIndex is the LiteralIndex of the clause literals
+  literals = []
+  for ruleLiteral in ruleLiterals:
+    if ruleLiteral.isGround():
+      if not clauseIndex.contains(ruleLiteral):
+        return False
+      continue
+    candidates = []
+    for clauseLiteral in clauseIndex.compatible(ruleLiteral):
+      candidate = matchLiteral(ruleLiteral, clauseLiteral, binding)
+      if candidate is not None:
+        candidates += [candidate]
+    if len(candidates) == 0:
+      return False
+    # a literal without free variables is there or not, whatever the other bindings
+    variables = set( term.value for term in ruleLiteral.terms[:ruleLiteral.arity] if term.isVariable() ) - set(binding)
+    if len(variables) != 0:
+      literals += [ ( variables, candidates ) ]
+  return search(literals, dict(binding))
+
+
+def search(literals, binding):
+  # literals: [ ( free variables, candidate bindings ) ]
+  remaining = []
+  for (variables, candidates) in literals:
+    candidates = [ candidate for candidate in candidates if consistent(candidate, binding) ]
+    if len(candidates) == 0:
+      return False
+    if not variables.issubset(binding):
+      remaining += [ ( variables, candidates ) ]
+  if len(remaining) == 0:
+    return True
+
+  best = min( range(len(remaining)), key = lambda i: len(remaining[i][1]) )
+  rest = remaining[:best] + remaining[best+1:]
+  for candidate in remaining[best][1]:
+    extended = dict(binding)
+    extended.update(candidate)
+    if search(rest, extended):
+      return True
+  return False
@@ -0,0 +1,124 @@
+import os
+import json
+import numpy as np
+from sim.util.utils import ERROR
+
+# an append-only log of the steps of a trajectory, a JSON object per line, so that a run can be re-filtered and
+# re-learnt offline. the first line is a header with the specification name; then a line per step:
+#   { "cmd": action name, "param": estimator parameters, "types": learner parameter types,
+#     "learnerParam": learner parameters, only if they differ from param,
+#     "prev": observation before the action, "next": observation after it }
+# observations are written as changes: prev against the next of the step before (empty, and left out, when the
+# trajectory is contiguous), next against prev, with "prevGone" / "nextGone" listing the predicates that went away.
+# JSON has no tuples: lists are read back as tuples, states and parameters never hold lists.
+# a line is written and flushed per step; a line cut short by an interrupted run is dropped when the log is
+# read or reopened.
+
+VERSION = 1
+
+
+def plain(value):
+  # numpy scalars -> python values for json
+  if isinstance(value, np.generic):
+    return value.item()
+  raise TypeError( "can't write %s to a trajectory log" % type(value) )
+
+def tuples(value):
+  # json lists -> tuples, recursively
+  if isinstance(value, list):
+    return tuple( tuples(v) for v in value )
+  if isinstance(value, dict):
+    return { k: tuples(v) for k, v in value.items() }
+  return value
+
+def changes(old, new):
+  # ( {pred: value} of new that differ from old, [ preds of old not in new ] )
+  changed = { pred: value for pred, value in new.items() if pred not in old or old[pred] != value or type(old[pred]) != type(value) }
+  return ( changed, [ pred for pred in old if pred not in new ] )
+
+def applyChanges(state, changed, gone):
+  state = dict(state)
+  state.update(changed)
+  for pred in gone:
+    del state[pred]
+  return state
+
+
+class TrajectoryLog:
+  def __init__(self, path, specification = None):
+    # opens path for appending, creating it with a header if it doesn't exist
+    self.path = path
+    self.last = {} # the next observation of the last step, what the next prev is written against
+    self.numSteps = 0
+    if os.path.exists(path):
+      dropPartialLine(path)
+    if os.path.exists(path) and os.path.getsize(path) != 0:
+      header = readHeader(path)
+      if specification is not None and header.get('specification') not in (None, specification):
+        ERROR( "ERROR: appending %s steps to a %s trajectory log" %( specification, header.get('specification') ) )
+      for step in readTrajectory(path):
+        self.last = step['next']
+        self.numSteps += 1
+      self.file = open(path, 'a')
+    else:
+      self.file = open(path, 'w')
+      self.write( { 'trajectory': VERSION, 'specification': specification } )
+
+  def write(self, record):
+    self.file.write( json.dumps( record, separators=(',', ':'), default=plain ) + "\n" )
+    self.file.flush()
+
+  def append(self, prevState, cmd, param, learnerParam, learnerParamTypes, newState):
+    record = { 'cmd': cmd, 'param': param, 'types': learnerParamTypes }
+    if learnerParam != param:
+      record['learnerParam'] = learnerParam
+    for (name, old, new) in ( ('prev', self.last, prevState), ('next', prevState, newState) ):
+      (changed, gone) = changes(old, new)
+      if len(changed) != 0 or name == 'next':
+        record[name] = changed
+      if len(gone) != 0:
+        record[name + 'Gone'] = gone
+    self.write(record)
+    self.last = dict(newState)
+    self.numSteps += 1
+
+  def close(self):
+    self.file.close()
+
+
+def dropPartialLine(path, blockSize = 4096):
+  # truncate the file after its last newline, reading back from the end a block at a time
+  with open(path, 'rb+') as f:
+    end = f.seek(0, os.SEEK_END)
+    pos = end
+    while pos > 0:
+      start = max( 0, pos - blockSize )
+      f.seek(start)
+      k = f.read( pos - start ).rfind(b'\n')
+      if k != -1:
+        if start + k + 1 != end:
+          f.truncate( start + k + 1 )
+        return
+      pos = start
+    f.truncate(0)
+
+def readHeader(path):
+  with open(path) as f:
+    return json.loads( f.readline() )
+
+def readTrajectory(path):
+  # streams the steps of a log: { 'cmd', 'param', 'learnerParam', 'types', 'prev', 'next' }, with the whole
+  # observations; only the step being read is held in memory
+  last = {}
+  with open(path) as f:
+    f.readline()
+    for line in f:
+      if not line.endswith("\n"):
+        # cut short by an interrupted run
+        return
+      record = json.loads(line)
+      prev = applyChanges( last, tuples( record.get('prev', {}) ), record.get('prevGone', []) )
+      last = applyChanges( prev, tuples( record['next'] ), record.get('nextGone', []) )
+      param = tuples( record['param'] )
+      yield { 'cmd': record['cmd'], 'param': param, 'learnerParam': tuples( record.get('learnerParam', param) ),
+              'types': record['types'], 'prev': prev, 'next': last }
@@ -2,6 +2,10 @@ from sim.state_estimator import Rule, ActionRuleBased
 from termcolor import colored
 import pandas as pd 
 
+# bounds of the world the kinematic checks use: 0 <= x < width, 0 <= y < height
+# (the viewer draws 9 x 3; synthetic worlds in benchmarks/ resize it)
+GRID = { 'width': 9, 'height': 4 }
+
 # -----------------------------
 def sum(listA, listB):
   if len(listA) != len(listB):
@@ -0,0 +1,62 @@
+import numpy as np
+
+# a set of example indices as the bits of a python int: bit i is set if example i is in the set.
+# a bit per example, whatever the number of indices in the set, and union / intersection / difference
+# are single int operations. iterating yields the indices in increasing order.
+
+class ExampleBitmap:
+  def __init__(self, indices = []):
+    # built through a bool array, adding indices one by one would copy the int every time
+    indices = np.fromiter( indices, dtype=np.int64 )
+    self.bits = 0
+    if len(indices) != 0:
+      present = np.zeros( indices.max() + 1, dtype=bool )
+      present[indices] = True
+      self.bits = int.from_bytes( np.packbits( present, bitorder='little' ).tobytes(), 'little' )
+
+  def add(self, index):
+    self.bits |= 1 << index
+
+  def remove(self, index):
+    self.bits &= ~(1 << index)
+
+  def __contains__(self, index):
+    return self.bits >> index & 1 == 1
+
+  def __len__(self):
+    return bin(self.bits).count('1')
+
+  def __bool__(self):
+    return self.bits != 0
+
+  def __iter__(self):
+    bits = self.bits
+    while bits:
+      low = bits & -bits
+      yield low.bit_length() - 1
+      bits ^= low
+
+  def __or__(self, other):
+    return fromBits( self.bits | other.bits )
+
+  def __and__(self, other):
+    return fromBits( self.bits & other.bits )
+
+  def __sub__(self, other):
+    return fromBits( self.bits & ~other.bits )
+
+  def __eq__(self, other):
+    return isinstance(other, ExampleBitmap) and self.bits == other.bits
+
+  def __repr__(self):
+    return str( list(self) )
+
+
+def fromBits(bits):
+  bitmap = ExampleBitmap()
+  bitmap.bits = bits
+  return bitmap
+
+def exampleRange(stop):
+  # indices 0 .. stop-1
+  return fromBits( (1 << stop) - 1 )
@@ -0,0 +1,55 @@
+# commands are an action name and a string of digits with its parameters:
+#   move q1q2   e.g. move 0212
+#   pick bpq    e.g. pick 00001
+#   place bpq   e.g. place 01112
+
+# the prompt for the parameters of each action
+COMMAND_PROMPTS = { 'move': "q1q2:", 'pick': "bpq: ", 'place': "bpq: " }
+
+
+def makeParams(cmd, args):
+  # args are ( q1, q2 ) for move and ( b, p, q ) for pick / place, positions and configurations as tuples
+  # returns ( param, learnerParam, learnerParamTypes )
+  if cmd == "move":
+    ( q1, q2 ) = args
+    param = {'arm':-1, 'q1':q1, 'q2':q2}
+    learnerParam = {'arm':-1, 'q1':q1, 'q2':q2}
+    learnerParamTypes = {'arm':'obj', 'q1':'conf', 'q2':'conf'}
+  else:
+    ( b, p, q ) = args
+    param = {'arm':-1, 'b':b, 'p':p, 'q':q}
+    learnerParam = {'arm':-1, 'b':b, 'p':p, 'q':q}
+    learnerParamTypes = {'arm':'obj', 'b':'obj', 'p':'pos', 'q':'conf'}
+  return ( param, learnerParam, learnerParamTypes )
+
+
+def parseCommand(cmd, cmd2):
+  # returns ( param, learnerParam, learnerParamTypes ), or None if the command is invalid
+  if not cmd2.isdigit():
+    return None
+  if cmd == "move":
+    if len(cmd2) == 4:
+      q1 = ( int(cmd2[0]), int(cmd2[1]) )
+      q2 = ( int(cmd2[2]), int(cmd2[3]) )
+      return makeParams( cmd, (q1, q2) )
+
+  elif cmd in ("pick", "place"):
+    if len(cmd2) == 5:
+      b = int(cmd2[0])
+      p = ( int(cmd2[1]), int(cmd2[2]) )
+      q = ( int(cmd2[3]), int(cmd2[4]) )
+      return makeParams( cmd, (b, p, q) )
+
+  return None
+
+
+def readCommands(lines):
+  # lines of "cmd cmd2"; blank lines and lines starting with # are skipped, "done" ends the trajectory
+  for line in lines:
+    line = line.strip()
+    if len(line) == 0 or line.startswith('#'):
+      continue
+    (cmd, _, cmd2) = line.partition(' ')
+    if cmd == "done":
+      return
+    yield ( cmd, cmd2.strip() )
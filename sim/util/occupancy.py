@@ -0,0 +1,46 @@
+import pandas as pd
+
+# occupancy of the grid in a state or hypothesis: which objects are at a cell, from the positions ( '<obj>.pos' ).
+# collision and support checks of the action models look cells up here instead of going over every predicate.
+
+# state key -> the object whose position it is, None for keys that aren't positions; filled as keys are seen
+POSITION_KEYS = {}
+
+def positionOf(key):
+  if key not in POSITION_KEYS:
+    sep = key.find('.')
+    POSITION_KEYS[key] = int(key[:sep]) if sep != -1 and key[sep+1:] == 'pos' else None
+  return POSITION_KEYS[key]
+
+def positionPreds(keys):
+  # [ (object, position predicate) ] in the order of keys
+  res = []
+  for key in keys:
+    obj = positionOf(key)
+    if obj is not None:
+      res += [ (obj, key) ]
+  return res
+
+
+class Occupancy:
+  # the arm (-1) is in it like the objects; positions that aren't known are listed in unknown
+  def __init__(self, hyp, positions):
+    self.cells = {} # cell -> [ object ]
+    self.unknown = []
+    for (obj, pred) in positions:
+      value = hyp[pred]
+      if value is None or pd.isnull(value):
+        self.unknown += [pred]
+      else:
+        self.cells.setdefault( value, [] ).append(obj)
+
+  def objectsAt(self, cell):
+    return self.cells.get( cell, [] )
+
+
+def occupancy(hyp):
+  # the Occupancy of a hypothesis or state. rows of a HypothesisStore build theirs once and keep it, see
+  # HypothesisRow.occupancy; for a plain state dict it is built here
+  if hasattr(hyp, 'occupancy'):
+    return hyp.occupancy()
+  return Occupancy( hyp, positionPreds( hyp.keys() ) )
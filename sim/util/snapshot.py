@@ -0,0 +1,34 @@
+import os
+import pickle
+import numpy as np
+
+# snapshots of the estimator and the learners, see HypothesisStore.save, ActionLearner.snapshot, Runner.snapshot.
+# a snapshot is a directory: large arrays are .npy files, read back memory-mapped so that a restore only reads the
+# pages that get used; the rest of the state is pickled. files are written next to their place and renamed into it,
+# so a snapshot being overwritten is never half written, and arrays mapped from the old files stay valid.
+
+STATE = 'state.pkl'
+
+
+def writeFile(path, write):
+  # write(f) into a temporary file, then rename it to path
+  tmp = path + '.tmp'
+  with open(tmp, 'wb') as f:
+    write(f)
+  os.replace(tmp, path)
+
+def saveArray(path, array):
+  writeFile( path, lambda f: np.save( f, np.ascontiguousarray(array) ) )
+
+def loadArray(path):
+  # mapped copy on write: changes to the array stay in memory, the file isn't touched
+  return np.load( path, mmap_mode='c' )
+
+def saveState(path, state):
+  # state is pickled into STATE in the directory path
+  os.makedirs(path, exist_ok=True)
+  writeFile( os.path.join(path, STATE), lambda f: pickle.dump( state, f, protocol=pickle.HIGHEST_PROTOCOL ) )
+
+def loadState(path):
+  with open( os.path.join(path, STATE), 'rb' ) as f:
+    return pickle.load(f)
@@ -0,0 +1,50 @@
+import importlib
+
+# specification name -> modules in sim.specifications:
+# ( ground truth action model, state estimator action model, initial conditions, observations, first observations )
+SPECIFICATIONS = {
+  'simpleComplete': ( 'simple.simple_correct_action_model', 'simple.simple_correct_action_model',
+                      'simple.simple_initial_conditions', 'simple.simple_observations', 'simple.simple_first_observations' ),
+  'simpleIncomplete': ( 'simple.simple_correct_action_model', 'simple.simple_incomplete_action_model',
+                        'simple.simple_initial_conditions', 'simple.simple_observations', 'simple.simple_first_observations' ),
+  'slipperyComplete': ( 'slippery.slippery_correct_action_model', 'slippery.slippery_correct_action_model',
+                        'slippery.slippery_initial_conditions', 'slippery.slippery_observations', 'slippery.slippery_first_observations' ),
+}
+
+
+def loadSpecification(name):
+  ( gtModule, seModule, initModule, obsModule, firstObsModule ) = [ importlib.import_module( 'sim.specifications.' + module ) for module in SPECIFICATIONS[name] ]
+  return { 'name': name,
+           'gt_actions': gtModule.actions,
+           'se_actions': seModule.actions,
+           'initial_conditions': initModule.initial_conditions,
+           'observed_predicates': obsModule.observed_predicates,
+           'observed_predicates_first': firstObsModule.observed_predicates_first,
+           'slippery': name.startswith('slippery') }
+
+
+def processInputs(initial_conditions, observed_predicates, observed_predicates_first):
+  bool_preds = []
+  cat_preds = []
+  init_conds = {}
+  observed_preds = []
+  observed_preds_first = []
+  diff_objects = []
+  for pred in initial_conditions:
+    if pred[0] != -1 and pred[0] not in diff_objects:
+      diff_objects += [pred[0]]
+    pred_name = str(pred[0]) + "." + pred[1]
+    if pred[2] == 'bool':
+      bool_preds += [pred_name]
+    elif pred[2] == 'cat':
+      cat_preds += [pred_name]
+    init_conds[pred_name] = pred[3]
+
+  for pred in observed_predicates:
+    pred_name = str(pred[0]) + "." + pred[1]
+    observed_preds += [pred_name]
+  for pred in observed_predicates_first:
+    pred_name = str(pred[0]) + "." + pred[1]
+    observed_preds_first += [pred_name]
+
+  return ( bool_preds, cat_preds, init_conds, observed_preds, observed_preds_first, len(diff_objects) )
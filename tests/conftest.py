@@ -0,0 +1,56 @@
+import pytest
+from benchmarks.worlds import WORLDS, makeSpecification, makeTrajectory, useGrid
+from sim.runner import Runner
+from sim.ilp import ActionLearner
+
+# a small benchmark world, see benchmarks.worlds: its specification, its trajectory as commands for Runner.step, and
+# the learner examples of the trajectory. tests pick another world with parametrize( 'world', [ name ], indirect=True )
+
+
+def commandOf(cmd, param):
+  # the digits Runner.step takes for the parameters of a trajectory step, see sim.util.commands
+  if cmd == 'move':
+    return '%d%d%d%d' % ( param['q1'] + param['q2'] )
+  return '%d%d%d%d%d' % ( ( param['b'], ) + param['p'] + param['q'] )
+
+
+@pytest.fixture
+def world(request):
+  world = WORLDS[ getattr(request, 'param', 'simple-9x4-4obj') ]
+  previous = useGrid(world)
+  spec = makeSpecification(world)
+  trajectory = makeTrajectory(world, spec)
+  yield { 'spec': spec, 'commands': [ ( cmd, commandOf(cmd, param) ) for (cmd, param, _, _) in trajectory ],
+          'trajectory': trajectory }
+  useGrid(previous)
+
+
+@pytest.fixture
+def examples(world):
+  # cmd -> [ (s, a, a_types, s') ], the whole state of the ground truth before and after each step.
+  # learners add predicates to the states they are given: tests take copies
+  runner = Runner( world['spec'] )
+  gt = runner.gt
+  state = lambda: { pred: gt.hyp.get(0, pred) for pred in gt.preds }
+  res = { cmd: [] for cmd in runner.actionLearners }
+  prevState = state()
+  for (cmd, param, learnerParam, learnerParamTypes) in world['trajectory']:
+    gt.applyAction( runner.gtActions[cmd], param )
+    newState = state()
+    res[cmd] += [ ( prevState, learnerParam, learnerParamTypes, newState ) ]
+    prevState = newState
+  return { 'extraPreds': { cmd: learner.extraPreds for (cmd, learner) in runner.actionLearners.items() },
+           'examples': res }
+
+
+@pytest.fixture
+def dumpRules():
+  # the rules of a learner with their example sets, to compare learners
+  return lambda learner: [ ( repr(rule), list(rule.E_plus), list(rule.E_minus), list(rule.E_minus_covered) ) for rule in learner.rules ]
+
+
+@pytest.fixture
+def learners():
+  # cmd -> a new ActionLearner for each action of the examples, quiet, with its examplePath if one is given
+  return lambda examples, examplePaths = {}: { cmd: ActionLearner( cmd, examples['extraPreds'][cmd], False, examplePaths.get(cmd) )
+                                               for cmd in examples['examples'] }
@@ -0,0 +1,33 @@
+import copy
+import pytest
+
+inWorlds = pytest.mark.parametrize( 'world', [ 'simple-9x4-4obj', 'slippery-9x4-4obj' ], indirect=True )
+
+
+@inWorlds
+def test_batch_equals_incremental(examples, learners, dumpRules):
+  incremental = learners(examples)
+  batch = learners(examples)
+  for cmd in examples['examples']:
+    for example in copy.deepcopy( examples['examples'][cmd] ):
+      incremental[cmd].addExample(example)
+    assert batch[cmd].addExamples( copy.deepcopy( examples['examples'][cmd] ) ) == len( examples['examples'][cmd] )
+  for cmd in examples['examples']:
+    assert len( incremental[cmd].rules ) != 0
+    assert dumpRules( batch[cmd] ) == dumpRules( incremental[cmd] )
+
+
+@inWorlds
+def test_batch_in_chunks(examples, learners, dumpRules):
+  # addExamples after addExample, and on top of earlier chunks
+  whole = learners(examples)
+  chunks = learners(examples)
+  for cmd in examples['examples']:
+    whole[cmd].fit( copy.deepcopy( examples['examples'][cmd] ) )
+    dataset = copy.deepcopy( examples['examples'][cmd] )
+    third = len(dataset) // 3
+    for example in dataset[:third]:
+      chunks[cmd].addExample(example)
+    chunks[cmd].addExamples( dataset[third:2*third] )
+    chunks[cmd].addExamples( dataset[2*third:] )
+    assert dumpRules( chunks[cmd] ) == dumpRules( whole[cmd] )
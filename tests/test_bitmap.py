@@ -0,0 +1,14 @@
+from sim.util.bitmap import ExampleBitmap, exampleRange
+
+
+def test_bitmap():
+  a = ExampleBitmap( [5, 0, 70, 5] )
+  b = ExampleBitmap( range(3, 8) )
+  assert list(a) == [0, 5, 70] and len(a) == 3 and 70 in a and 6 not in a
+  assert list( a | b ) == [0, 3, 4, 5, 6, 7, 70]
+  assert list( a & b ) == [5]
+  assert list( a - b ) == [0, 70]
+  assert exampleRange(4) == ExampleBitmap( range(4) )
+  a.remove(70)
+  a.add(2)
+  assert list(a) == [0, 2, 5] and not ExampleBitmap()
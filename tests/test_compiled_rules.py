@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+import sim.compiled_rules as compiled_rules
+from sim.util.specification_util import processInputs
+from sim.state_estimator import StateEstimator
+
+
+def hypotheses(se):
+  return sorted( repr( sorted( dict( se.hyp.row(index) ).items() ) ) for index in range( se.numHyp() ) )
+
+def estimators(world, **kwargs):
+  # the ground truth of a world, and an estimator that observes everything but armEmpty and the positions of 1 and 3
+  spec = world['spec']
+  ( bool_preds, cat_preds, init_conds, observed_preds, _, _ ) = processInputs(
+    spec['initial_conditions'], spec['observed_predicates'], spec['observed_predicates_first'] )
+  gt = StateEstimator(bool_preds, cat_preds, False)
+  gt.observe(init_conds)
+  se = StateEstimator(bool_preds, cat_preds, False, True, **kwargs)
+  se.observe( { pred: value for (pred, value) in init_conds.items() if pred not in ( '-1.armEmpty', '1.pos', '3.pos' ) } )
+  return (gt, se, [ pred for pred in observed_preds if pred != '-1.armEmpty' ])
+
+def scatter(store, cmd, param, rng, cells):
+  # the rows of the store with the arm where the action starts, everything else anywhere in cells
+  for index in range( store.numHyp() ):
+    store.set( index, '-1.pos', param['q1'] if cmd == 'move' else param['q'] )
+    for obj in range(4):
+      store.set( index, '%d.pos' % obj, cells[ rng.integers( len(cells) ) ] )
+      store.set( index, '%d.movable' % obj, bool( rng.integers(2) ) )
+    store.set( index, '-1.armEmpty', bool( rng.integers(2) ) )
+    store.set( index, '-1.objectHeld', int( rng.integers(-1, 4) ) )
+
+
+@pytest.mark.parametrize( 'world', [ 'simple-9x4-4obj-unknown', 'slippery-9x4-4obj' ], indirect=True )
+def test_workers_match_serial(world, monkeypatch):
+  # every action goes through the pool; plans recur, so later calls find them in the workers or send them again
+  monkeypatch.setattr( compiled_rules, 'PARALLEL_MIN_ROWS', 0 )
+  (gt, serial, observed) = estimators(world)
+  (_, parallel, _) = estimators(world, numWorkers = 2)
+  try:
+    for (cmd, param, _, _) in world['trajectory'][:60]:
+      gt.applyAction( world['spec']['gt_actions'][cmd], param )
+      for se in (serial, parallel):
+        se.applyAction( world['spec']['se_actions'][cmd], param )
+      assert hypotheses(parallel) == hypotheses(serial)
+      for se in (serial, parallel):
+        se.observe( { pred: gt.hyp.get(0, pred) for pred in observed } )
+        se.hypothesisRemoval()
+    assert parallel.pool is not None and len( compiled_rules.SHIPPED[parallel.pool] ) != 0
+  finally:
+    parallel.close()
+
+
+def test_workers_match_serial_activations(world, monkeypatch):
+  # many rows, most of them their own group: masks and parameter copies from the pool are those of the serial path
+  monkeypatch.setattr( compiled_rules, 'PARALLEL_MIN_ROWS', 0 )
+  (gt, se, _) = estimators(world, numWorkers = 2)
+  store = gt.hyp
+  store.appendRows( *[ np.repeat( column, 299, axis=0 ) for column in ( store.known, store.value, store.cat ) ] )
+  rng = np.random.default_rng(0)
+  cells = [ (x, y) for x in range(9) for y in range(4) ]
+  try:
+    for (cmd, param, _, _) in world['trajectory'][:12]:
+      scatter(store, cmd, param, rng, cells)
+      plan = world['spec']['se_actions'][cmd].compile( param, store )
+      (masks, rowParams) = plan.activations(store)
+      for _ in range(2):
+        (poolMasks, poolParams) = plan.activations( store, 2, se.workerPool() )
+        assert ( poolMasks == masks ).all() and poolParams == rowParams
+    assert len( compiled_rules.SHIPPED[se.pool] ) != 0
+  finally:
+    se.close()
+
+
+def test_groups_match_rows(world, monkeypatch):
+  # functions run once per group of rows that agree on what they read; without the declarations they run on every
+  # row. masks, parameter copies (obj_held of KinMove) and the rows after the effects must be the same
+  (gt, _, _) = estimators(world)
+  store = gt.hyp
+  store.appendRows( *[ np.repeat( column, 299, axis=0 ) for column in ( store.known, store.value, store.cat ) ] )
+  rng = np.random.default_rng(1)
+  # few cells, so that rows often agree
+  cells = [ (0, 0), (1, 1) ]
+  actions = world['spec']['se_actions']
+  funcs = set( pred.func for action in actions.values() for rule in action.rules for pred in rule.precondPreds if pred.predType == 'fromFunc' )
+  held = 0
+  for (cmd, param, _, _) in world['trajectory'][:40]:
+    if cmd == 'move':
+      param = dict( param, q2 = ( param['q1'][0], param['q1'][1] + 1 ) )
+    scatter(store, cmd, param, rng, cells)
+    grouped = actions[cmd].compile(param, store)
+    assert grouped.funcBits is not None
+    (groupedMasks, groupedParams) = grouped.activations(store)
+
+    with monkeypatch.context() as patch:
+      for func in funcs:
+        patch.delattr(func, 'reads')
+      ungrouped = actions[cmd].compile(param, store)
+      assert ungrouped.funcBits is None
+      (masks, rowParams) = ungrouped.activations(store)
+      after = store.emptyCopy()
+      after.appendRows( store.known.copy(), store.value.copy(), store.cat.copy() )
+      ungrouped.evaluate(after)
+
+    assert ( groupedMasks == masks ).all() and groupedParams == rowParams
+    held += sum( 'obj_held' in rowParam for rowParam in rowParams.values() )
+    grouped.evaluate(store)
+    assert ( store.known == after.known ).all() and ( store.value == after.value ).all() and ( store.cat == after.cat ).all()
+  assert held != 0
+
+
+def test_groups_catch_a_wrong_declaration(world, monkeypatch):
+  # KinMove declared as reading the positions only: rows that differ in armEmpty or objectHeld share a result
+  (gt, _, _) = estimators(world)
+  store = gt.hyp
+  store.appendRows( *[ np.repeat( column, 99, axis=0 ) for column in ( store.known, store.value, store.cat ) ] )
+  action = world['spec']['se_actions']['move']
+  kinMove = [ pred.func for pred in action.rules[0].precondPreds if pred.predType == 'fromFunc' ][0]
+  param = [ param for (cmd, param, _, _) in world['trajectory'] if cmd == 'move' ][0]
+  param = dict( param, q2 = ( param['q1'][0], param['q1'][1] + 1 ) )
+  scatter( store, 'move', param, np.random.default_rng(2), [ (0, 0), (1, 1) ] )
+  (masks, rowParams) = action.compile(param, store).activations(store)
+  monkeypatch.setattr( kinMove, 'reads', [ '*.pos' ] )
+  (wrongMasks, wrongParams) = action.compile(param, store).activations(store)
+  assert not ( ( wrongMasks == masks ).all() and wrongParams == rowParams )
+
+
+@pytest.mark.parametrize( 'world', [ 'simple-9x4-4obj', 'slippery-9x4-4obj' ], indirect=True )
+def test_missing_matches_sufficiency_checks(world):
+  # the missing bits of every row are the bool predicates the preconditions report insufficient one row at a time,
+  # functions through their own sufficiency check; the cat ones are reported once
+  (gt, _, _) = estimators(world)
+  store = gt.hyp
+  store.appendRows( *[ np.repeat( column, 199, axis=0 ) for column in ( store.known, store.value, store.cat ) ] )
+  rng = np.random.default_rng(3)
+  for index in range( store.numHyp() ):
+    for pred in store.preds:
+      if rng.random() < 0.15:
+        store.set(index, pred, None)
+  actions = world['spec']['se_actions']
+  for (cmd, param, _, _) in world['trajectory'][:30]:
+    plan = actions[cmd].compile(param, store)
+    (missing, unknownCats) = plan.missing(store)
+    expectedCats = set()
+    for index in range( store.numHyp() ):
+      row = store.row(index)
+      expected = set()
+      for rule in actions[cmd].rules:
+        for pred in rule.precondPreds:
+          (isSuff, insuffPreds) = pred.isSufficient( dict(param), row )
+          if not isSuff:
+            expected.update( predName for predName in insuffPreds if store.isBool(predName) )
+            expectedCats.update( predName for predName in insuffPreds if not store.isBool(predName) )
+      bits = store.unpack( missing[index:index+1] )[0]
+      assert set( store.bool_preds[i] for i in np.flatnonzero(bits) ) == expected
+    assert set(unknownCats) == expectedCats and len(unknownCats) == len(expectedCats)
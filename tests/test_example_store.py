@@ -0,0 +1,108 @@
+import os
+import copy
+import numpy as np
+from sim.example_store import ExampleStore, copyStore, COLUMNS
+from sim.ilp import ActionLearner
+from sim.runner import Runner
+
+# examples as ( precondition keys, effect keys ), with numpy scalars as the learner has them
+EXAMPLES = [ ( [ ('pos', 'o%d' % (i % 3), np.int64(i)), ('armEmpty', True) ], [ ('pos', 'o%d' % (i % 3), i + 1) ] )
+             for i in range(10) ]
+
+
+def fill(store, examples = EXAMPLES):
+  return [ store.append(preconds, effects) for (preconds, effects) in examples ]
+
+def contents(store):
+  return [ store.literalKeys(index) for index in range( store.numExamples() ) ]
+
+def expected(examples = EXAMPLES):
+  plain = lambda key: tuple( v.item() if isinstance(v, np.generic) else v for v in key )
+  return [ ( [ plain(key) for key in preconds ], [ plain(key) for key in effects ] ) for (preconds, effects) in examples ]
+
+
+def test_in_memory_across_flushes():
+  store = ExampleStore()
+  store.FLUSH_EVERY = 3
+  assert fill(store) == list( range( len(EXAMPLES) ) )
+  assert store.numWritten == 9 and len(store.pending) == 1
+  assert contents(store) == expected()
+  store.flush()
+  assert contents(store) == expected()
+  assert store.effectKeys(4) == expected()[4][1]
+
+
+def test_path_reopen(tmp_path):
+  path = str(tmp_path)
+  store = ExampleStore(path)
+  store.FLUSH_EVERY = 4
+  fill( store, EXAMPLES[:6] )
+  store.flush()
+  store = ExampleStore(path)
+  assert contents(store) == expected( EXAMPLES[:6] )
+  fill( store, EXAMPLES[6:] )
+  store.flush()
+  assert contents( ExampleStore(path) ) == expected()
+
+
+def test_interrupted_write_is_dropped(tmp_path):
+  path = str(tmp_path)
+  store = ExampleStore(path)
+  fill( store, EXAMPLES[:5] )
+  store.flush()
+  # a write cut short: literals of an example that has no offsets yet
+  for name in ('preconds', 'effects'):
+    with open( os.path.join(path, name + '.bin'), 'ab' ) as f:
+      f.write( np.array( [0, 1, 2], dtype=COLUMNS[name] ).tobytes() )
+  with open( os.path.join(path, 'precondEnds.bin'), 'ab' ) as f:
+    f.write( np.array( [1000], dtype=COLUMNS['precondEnds'] ).tobytes() )
+
+  store = ExampleStore(path)
+  assert store.numExamples() == 5
+  assert contents(store) == expected( EXAMPLES[:5] )
+  fill( store, EXAMPLES[5:] )
+  store.flush()
+  assert contents( ExampleStore(path) ) == expected()
+
+
+def test_save_and_copy(tmp_path):
+  store = ExampleStore()
+  store.FLUSH_EVERY = 4
+  fill(store)
+  store.save( str(tmp_path / 'saved') )
+  assert contents( ExampleStore( str(tmp_path / 'saved') ) ) == expected()
+
+  copyStore( str(tmp_path / 'saved'), str(tmp_path / 'copy') )
+  copied = ExampleStore( str(tmp_path / 'copy') )
+  fill( copied, EXAMPLES[:2] )
+  copied.flush()
+  assert contents( ExampleStore( str(tmp_path / 'copy') ) ) == expected() + expected( EXAMPLES[:2] )
+  # the copy is appended to, not the saved store
+  assert contents( ExampleStore( str(tmp_path / 'saved') ) ) == expected()
+
+
+def test_relearn_from_example_path(examples, learners, dumpRules, tmp_path):
+  paths = { cmd: str( tmp_path / cmd ) for cmd in examples['examples'] }
+  first = learners(examples, paths)
+  for (cmd, learner) in first.items():
+    # fewer examples than ExampleStore.FLUSH_EVERY: all of them are still buffered until close
+    assert len( examples['examples'][cmd] ) < learner.examples.FLUSH_EVERY
+    learner.addExamples( copy.deepcopy( examples['examples'][cmd] ) )
+    assert learners(examples, paths)[cmd].examples.numExamples() == 0
+    learner.close()
+  reopened = learners(examples, paths)
+  for (cmd, learner) in reopened.items():
+    assert learner.examples.numExamples() == len( examples['examples'][cmd] )
+    assert dumpRules( learner.relearn() ) == dumpRules( first[cmd] )
+
+
+def test_runner_close_writes_examples(world, tmp_path):
+  runner = Runner( world['spec'] )
+  for (cmd, learner) in runner.actionLearners.items():
+    runner.actionLearners[cmd] = ActionLearner( cmd, learner.extraPreds, False, str( tmp_path / cmd ) )
+  for (cmd, cmd2) in world['commands'][:30]:
+    assert runner.step(cmd, cmd2)
+  runner.close()
+  for (cmd, learner) in runner.actionLearners.items():
+    assert learner.examples.numExamples() != 0
+    assert contents( ExampleStore( str( tmp_path / cmd ) ) ) == contents(learner.examples)
@@ -0,0 +1,293 @@
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from sim.hypothesis_store import HypothesisStore, WORD_BITS
+
+# the store against plain {predicate: value} rows, unknown values None. there are more bool predicates than fit in a
+# word, and cat predicates with tuple, int and string values
+BOOLS = [ '%d.movable' % i for i in range( WORD_BITS + 6 ) ]
+CATS = [ '-1.pos', '0.pos', '-1.objectHeld', '0.color' ]
+VALUES = { '-1.pos': [ (0, 0), (1, 0), (1, 1) ], '0.pos': [ (0, 0), (2, 0) ], '-1.objectHeld': [ -1, 0, 1 ], '0.color': [ 'red', 'blue' ] }
+
+
+def makeStore():
+  return HypothesisStore(BOOLS, CATS)
+
+def randomRow(rng, unknown = 0.3):
+  row = { pred: None if rng.random() < unknown else rng.random() < 0.5 for pred in BOOLS }
+  row.update( { pred: None if rng.random() < unknown else rng.choice( VALUES[pred] ) for pred in CATS } )
+  return row
+
+def encodeRows(store, rows):
+  # rows -> (known, value, cat) arrays for appendRows / writeRows, written with setIn
+  empty = store.emptyCopy()
+  empty.addEmptyRow()
+  known = np.repeat( empty.known, len(rows), axis=0 )
+  value = np.repeat( empty.value, len(rows), axis=0 )
+  cat = np.repeat( empty.cat, len(rows), axis=0 )
+  for (index, row) in enumerate(rows):
+    for (pred, predValue) in row.items():
+      store.setIn(known, value, cat, index, pred, predValue)
+  return (known, value, cat)
+
+def decodeRows(store):
+  return [ dict( store.row(index) ) for index in range( store.numHyp() ) ]
+
+
+def test_rows_against_oracle():
+  rng = random.Random(0)
+  store = makeStore()
+  oracle = []
+  for step in range(200):
+    op = rng.choice( [ 'append', 'append', 'drop', 'keep', 'set', 'write' ] )
+    if op == 'append' or len(oracle) == 0:
+      rows = [ randomRow(rng) for _ in range( rng.randrange(1, 6) ) ]
+      store.appendRows( *encodeRows(store, rows) )
+      oracle += rows
+    elif op == 'drop':
+      indices = sorted( rng.sample( range(len(oracle)), rng.randrange( 0, len(oracle) + 1 ) ) )
+      store.dropRows(indices)
+      oracle = [ row for (index, row) in enumerate(oracle) if index not in indices ]
+    elif op == 'keep':
+      mask = np.array( [ rng.random() < 0.8 for _ in oracle ], dtype=bool )
+      store.keepRows(mask)
+      oracle = [ row for (row, keep) in zip(oracle, mask) if keep ]
+    elif op == 'set':
+      index = rng.randrange( len(oracle) )
+      pred = rng.choice( BOOLS + CATS )
+      predValue = randomRow(rng, 0.5)[pred]
+      store.set(index, pred, predValue)
+      oracle[index][pred] = predValue
+    else:
+      indices = sorted( rng.sample( range(len(oracle)), rng.randrange( 1, len(oracle) + 1 ) ) )
+      rows = [ randomRow(rng) for _ in indices ]
+      store.writeRows( indices, *encodeRows(store, rows) )
+      for (index, row) in zip(indices, rows):
+        oracle[index] = row
+
+    assert store.numHyp() == len(oracle)
+    assert decodeRows(store) == oracle
+    for _ in range(5):
+      if len(oracle) != 0:
+        index = rng.randrange( len(oracle) )
+        pred = rng.choice( BOOLS + CATS )
+        assert store.get(index, pred) == oracle[index][pred]
+
+
+def test_set_in():
+  # setIn writes into arrays shaped like the store's, the store itself is left alone
+  rng = random.Random(1)
+  store = makeStore()
+  rows = [ randomRow(rng) for _ in range(4) ]
+  store.appendRows( *encodeRows(store, rows) )
+  (known, value, cat) = ( store.known.copy(), store.value.copy(), store.cat.copy() )
+  store.setIn( known, value, cat, 2, BOOLS[-1], True )
+  store.setIn( known, value, cat, 2, BOOLS[0], np.nan )
+  store.setIn( known, value, cat, 2, '-1.pos', (5, 5) )
+  store.setIn( known, value, cat, 2, '0.color', None )
+  decoded = store.decodeRow( known[2], value[2], cat[2] )
+  assert decoded[BOOLS[-1]] is True and decoded[BOOLS[0]] is None
+  assert decoded['-1.pos'] == (5, 5) and decoded['0.color'] is None
+  assert decodeRows(store) == rows
+
+
+def test_to_data_frame():
+  # the layout of the DataFrame the estimator kept before: a column per predicate, bool predicates first, a row per
+  # hypothesis indexed from 0, unknown values NaN
+  rng = random.Random(2)
+  store = makeStore()
+  rows = [ randomRow(rng) for _ in range(6) ] + [ { pred: None for pred in BOOLS + CATS } ]
+  store.appendRows( *encodeRows(store, rows) )
+  df = store.toDataFrame()
+  old = pd.DataFrame( [ { pred: np.nan if value is None else value for (pred, value) in row.items() } for row in rows ],
+                      columns = BOOLS + CATS )
+
+  assert list(df.columns) == list(old.columns) and list(df.index) == list(old.index)
+  assert ( df.isnull() == old.isnull() ).all().all()
+  for pred in BOOLS + CATS:
+    for index in range( len(rows) ):
+      if not pd.isnull( old[pred][index] ):
+        assert df[pred][index] == old[pred][index] and type( df[pred][index] ) == type( old[pred][index] )
+  assert repr(store) == repr(df)
+
+
+def observeRows(rows, observations):
+  # observe a row at a time: a row with a known value other than the observed one goes, the others take the observed
+  # values. an unknown observed value tells nothing. returns (rows, indices of the rows that went)
+  kept = []
+  removed = []
+  for (index, row) in enumerate(rows):
+    known = { pred: value for (pred, value) in observations.items() if value is not None and not pd.isnull(value) }
+    if any( row[pred] is not None and row[pred] != value for (pred, value) in known.items() ):
+      removed += [index]
+    else:
+      kept += [ dict( row, **known ) ]
+  return (kept, removed)
+
+
+def test_observe_against_rows():
+  rng = random.Random(3)
+  for _ in range(50):
+    rows = [ randomRow(rng, 0.6) for _ in range( rng.randrange(1, 30) ) ]
+    observations = {}
+    for pred in rng.sample( BOOLS + CATS, rng.randrange(1, 12) ):
+      observations[pred] = randomRow(rng, 0.2)[pred]
+    if rng.random() < 0.3:
+      # a value no row has seen yet
+      observations['-1.pos'] = (7, 7)
+    if rng.random() < 0.3:
+      observations[ rng.choice(BOOLS) ] = np.nan
+    store = makeStore()
+    store.appendRows( *encodeRows(store, rows) )
+
+    (kept, removed) = observeRows(rows, observations)
+    pruned = store.observe(observations)
+    assert [ index for (index, pred) in pruned ] == removed
+    for (index, pred) in pruned:
+      # the predicate reported is one the row disagrees on
+      assert rows[index][pred] is not None and rows[index][pred] != observations[pred]
+    assert decodeRows(store) == kept
+
+
+def test_observe_conflicts():
+  store = makeStore()
+  rows = [ { pred: None for pred in BOOLS + CATS } for _ in range(4) ]
+  rows[0].update( { BOOLS[0]: True, '-1.pos': (0, 0) } )
+  rows[1].update( { BOOLS[0]: False, '-1.pos': (0, 0) } )  # bool conflict
+  rows[2].update( { BOOLS[-1]: True, '-1.pos': (1, 0) } )  # cat conflict
+  rows[3].update( { BOOLS[-1]: False } )                   # unknowns only, filled in
+  store.appendRows( *encodeRows(store, rows) )
+
+  pruned = store.observe( { BOOLS[0]: True, '-1.pos': (0, 0), BOOLS[-1]: False, '0.color': None } )
+  assert pruned == [ (1, BOOLS[0]), (2, BOOLS[-1]) ]
+  assert store.numHyp() == 2
+  for index in range(2):
+    assert store.get(index, BOOLS[0]) is True and store.get(index, '-1.pos') == (0, 0) and store.get(index, BOOLS[-1]) is False
+    assert store.get(index, '0.color') is None
+
+  # every row disagrees: all of them go
+  assert [ index for (index, pred) in store.observe( { '-1.pos': (1, 1) } ) ] == [0, 1]
+  assert store.numHyp() == 0
+
+
+def test_observe_unknown_predicate():
+  # as with the DataFrame, a predicate that isn't a column is an error; the rows are left as they were
+  store = makeStore()
+  rows = [ randomRow( random.Random(4) ) ]
+  store.appendRows( *encodeRows(store, rows) )
+  with pytest.raises(KeyError):
+    store.observe( { BOOLS[0]: True, '9.nothing': True } )
+  assert decodeRows(store) == rows
+
+
+def mergeRows(rows):
+  # one round of the pairwise merge: every two rows with the same unknowns and cat values whose bool values differ in
+  # a single predicate go, a row with that predicate unknown comes instead. returns the rows as a sorted list
+  removed = set()
+  added = []
+  for i in range( len(rows) ):
+    for j in range( i + 1, len(rows) ):
+      (a, b) = ( rows[i], rows[j] )
+      if any( (a[pred] is None) != (b[pred] is None) for pred in BOOLS ) or any( a[pred] != b[pred] for pred in CATS ):
+        continue
+      differ = [ pred for pred in BOOLS if a[pred] != b[pred] ]
+      if len(differ) == 1:
+        removed.update( (i, j) )
+        merged = dict(a)
+        merged[ differ[0] ] = None
+        if merged not in added:
+          added += [merged]
+  return canonical( [ row for (index, row) in enumerate(rows) if index not in removed ] + added )
+
+def canonical(rows):
+  return sorted( repr( sorted( row.items() ) ) for row in rows )
+
+def mergingRows(rng, numRows):
+  # rows that only vary in a few bool predicates, in both words, and in one cat predicate, so that many pairs merge
+  rows = []
+  for _ in range(numRows):
+    row = { pred: False for pred in BOOLS }
+    row.update( { pred: VALUES[pred][0] for pred in CATS } )
+    for pred in BOOLS[:3] + BOOLS[-2:]:
+      row[pred] = None if rng.random() < 0.2 else rng.random() < 0.5
+    row['-1.pos'] = rng.choice( VALUES['-1.pos'][:2] )
+    rows += [row]
+  return rows
+
+
+def test_merge_round_against_pairwise():
+  rng = random.Random(5)
+  for _ in range(30):
+    rows = mergingRows( rng, rng.randrange(2, 40) )
+    store = makeStore()
+    store.appendRows( *encodeRows(store, rows) )
+    # round after round, as hypothesisRemoval does
+    while True:
+      expected = mergeRows(rows)
+      (numRemoved, numAdded) = store.mergeRound()
+      rows = decodeRows(store)
+      assert canonical(rows) == expected
+      if numRemoved == 0:
+        break
+
+
+def test_merge_needs_same_unknowns_and_cat_values():
+  store = makeStore()
+  base = { pred: False for pred in BOOLS }
+  base.update( { pred: VALUES[pred][0] for pred in CATS } )
+  rows = [ dict( base, **{ BOOLS[0]: True } ), dict( base, **{ BOOLS[0]: False, '-1.pos': (1, 0) } ),
+           # as many unknowns as each other, but not the same ones
+           dict( base, **{ BOOLS[1]: True, BOOLS[2]: None } ), dict( base, **{ BOOLS[1]: False, BOOLS[3]: None } ),
+           # an unknown against a known value
+           dict( base, **{ BOOLS[4]: None, '0.pos': (2, 0) } ), dict( base, **{ BOOLS[4]: True, '0.pos': (2, 0) } ) ]
+  store.appendRows( *encodeRows(store, rows) )
+  assert store.mergeRound() == (0, 0)
+  assert decodeRows(store) == rows
+
+  # with the same cat values and unknowns they do merge
+  store.appendRows( *encodeRows( store, [ dict( base, **{ BOOLS[0]: False } ) ] ) )
+  assert store.mergeRound() == (2, 1)
+  assert decodeRows(store)[-1] == dict( base, **{ BOOLS[0]: None } )
+
+
+def fullScanCore(rows):
+  # the core as findCore had it before: the predicates with the value of row 0 in every row, unknowns left out
+  if len(rows) == 0:
+    return {}
+  return { pred: rows[0][pred] for pred in rows[0] if rows[0][pred] is not None and all( row[pred] == rows[0][pred] for row in rows ) }
+
+
+def test_core_is_maintained():
+  rng = random.Random(6)
+  store = makeStore()
+  for step in range(300):
+    op = rng.choice( [ 'append', 'drop', 'keep', 'observe', 'merge', 'write', 'setIn', 'set' ] )
+    if op == 'append' or store.numHyp() == 0:
+      store.appendRows( *encodeRows( store, mergingRows( rng, rng.randrange(1, 8) ) ) )
+    elif op == 'drop':
+      store.dropRows( sorted( rng.sample( range( store.numHyp() ), rng.randrange( 0, store.numHyp() ) ) ) )
+    elif op == 'keep':
+      store.keepRows( np.array( [ rng.random() < 0.9 for _ in range( store.numHyp() ) ], dtype=bool ) )
+    elif op == 'observe':
+      row = mergingRows(rng, 1)[0]
+      store.observe( { pred: row[pred] for pred in rng.sample( BOOLS[:3] + BOOLS[-2:] + CATS, 2 ) } )
+    elif op == 'merge':
+      store.mergeRound()
+    elif op == 'write':
+      indices = sorted( rng.sample( range( store.numHyp() ), rng.randrange( 1, store.numHyp() + 1 ) ) )
+      store.writeRows( indices, *encodeRows( store, mergingRows( rng, len(indices) ) ) )
+    elif op == 'setIn':
+      # the way CompiledAction.apply writes: setIn on copies, then writeRows of the touched rows
+      (known, value, cat) = ( store.known.copy(), store.value.copy(), store.cat.copy() )
+      indices = sorted( rng.sample( range( store.numHyp() ), rng.randrange( 1, store.numHyp() + 1 ) ) )
+      pred = rng.choice( BOOLS[:3] + BOOLS[-2:] + CATS )
+      for index in indices:
+        store.setIn( known, value, cat, index, pred, mergingRows(rng, 1)[0][pred] )
+      store.writeRows( indices, known[indices], value[indices], cat[indices] )
+    else:
+      pred = rng.choice( BOOLS[:3] + CATS )
+      store.set( rng.randrange( store.numHyp() ), pred, mergingRows(rng, 1)[0][pred] )
+
+    assert dict( store.getCore() ) == fullScanCore( decodeRows(store) ), op
+    assert sorted( store.findCore() ) == sorted( fullScanCore( decodeRows(store) ) )
@@ -0,0 +1,48 @@
+import copy
+import numpy as np
+import sim.ilp as ilp
+from sim.ilp import Literal, Term, resetInterned
+
+
+def test_values_keyed_with_their_type():
+  # equal values of different types are different terms
+  assert Term( termType = 'obj', value = True ) is not Term( termType = 'obj', value = 1 )
+  assert Term( termType = 'obj', value = 1.0 ) is not Term( termType = 'obj', value = 1 )
+  assert Term( termType = 'pos', value = (True, 0) ) is not Term( termType = 'pos', value = (1, 0) )
+  assert Term( termType = 'obj', value = True ).value is True
+  positive = Literal( positive = True, name = 'p', arity = 0, terms = [] )
+  assert Literal( positive = 1, name = 'p', arity = 0, terms = [] ) is not positive
+
+  # numpy scalars are the python values
+  assert Term( termType = 'obj', value = np.int64(1) ) is Term( termType = 'obj', value = 1 )
+  assert type( Term( termType = 'obj', value = np.int32(7) ).value ) is int
+  assert Term( termType = 'obj', value = np.bool_(True) ) is Term( termType = 'obj', value = True )
+  pos = Term( termType = 'pos', value = ( np.int64(2), np.int64(3) ) )
+  assert pos is Term( termType = 'pos', value = (2, 3) ) and all( type(v) is int for v in pos.value )
+  assert Literal( positive = np.bool_(True), name = 'p', arity = 0, terms = [] ) is positive
+  assert Literal( positive = np.bool_(True), name = 'p', arity = 0, terms = [] ).positive is True
+
+
+def test_reset_keeps_the_rules(examples, learners, dumpRules):
+  # the values only a dropped literal referred to go, the literals of the rules are still the interned ones and
+  # learning goes on as without the reset
+  dataset = examples['examples']
+  kept = learners(examples)
+  for (cmd, learner) in kept.items():
+    learner.addExamples( copy.deepcopy( dataset[cmd] ) )
+  reset = learners(examples)
+  for (cmd, learner) in reset.items():
+    learner.addExamples( copy.deepcopy( dataset[cmd][ :len( dataset[cmd] ) // 2 ] ) )
+  dropped = Literal( positive = True, name = 'dropped', arity = 1, terms = [ Term( termType = 'obj', value = 'dropped' ) ] )
+
+  resetInterned( reset.values() )
+  assert ( True, 'dropped', 1, dropped.terms ) not in ilp.LITERALS and ( 'obj', 'constant', 'dropped' ) not in ilp.TERMS
+  for learner in reset.values():
+    for rule in learner.rules:
+      for literal in rule.preconds + rule.effects:
+        assert Literal( positive = literal.positive, name = literal.name, arity = literal.arity, terms = literal.terms ) is literal
+        assert all( Term( termType = term.type, value = term.value, valueType = term.valueType ) is term for term in literal.terms )
+
+  for (cmd, learner) in reset.items():
+    learner.addExamples( copy.deepcopy( dataset[cmd][ len( dataset[cmd] ) // 2: ] ) )
+    assert dumpRules(learner) == dumpRules( kept[cmd] )
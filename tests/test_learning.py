@@ -0,0 +1,62 @@
+import copy
+import pytest
+from sim.util.bitmap import ExampleBitmap
+from sim.ilp import AntiUnifier, Literal, Term, variableName
+
+
+inWorlds = pytest.mark.parametrize( 'world', [ 'simple-9x4-4obj', 'slippery-9x4-4obj' ], indirect=True )
+
+
+@inWorlds
+def test_covered_negatives_are_verified(examples, learners):
+  # E_minus_covered as recorded while learning is what checking all negatives against the final rules finds
+  batch = learners(examples)
+  for (cmd, learner) in batch.items():
+    learner.addExamples( copy.deepcopy( examples['examples'][cmd] ) )
+    for (ruleIndex, rule) in enumerate(learner.rules):
+      covered = rule.E_minus_covered
+      rule.E_minus_covered = ExampleBitmap()
+      assert learner.verifyNegatives(ruleIndex) == covered
+
+
+def literal(name, *values):
+  terms = [ Term( termType = 'obj', value = value, valueType = 'variable' if value.isupper() else 'constant' ) for value in values ]
+  return Literal( positive = True, name = name, arity = len(terms), terms = terms )
+
+
+def test_variable_names():
+  names = [ variableName(i) for i in range(200) ]
+  assert names[:3] == [ 'X', 'Y', 'Z' ] and names[25] == 'W'
+  assert names[26:29] == [ 'X1', 'Y1', 'Z1' ] and names[52] == 'X2'
+  assert len( set(names) ) == len(names)
+
+
+def test_pairs_within_an_example():
+  lgg = AntiUnifier()
+  # a pair met again in the same example is the same variable, in the same literal or another one
+  assert lgg.generalizeLiteral( literal('r', 'a', 'a'), literal('r', 'b', 'b') ) is literal('r', 'X', 'X')
+  assert lgg.generalizeLiteral( literal('p', 'a'), literal('p', 'b') ) is literal('p', 'X')
+  assert lgg.generalizeLiteral( literal('r', 'a', 'c'), literal('r', 'd', 'b') ) is literal('r', 'Y', 'Z')
+  assert lgg.generalizeLiteral( literal('r', 'c', 'a'), literal('r', 'b', 'b') ) is literal('r', 'Z', 'X')
+  # a variable of the rule keeps its name for the first term it meets, the same term after that
+  assert lgg.generalizeLiteral( literal('p', 'Y'), literal('p', 'e') ) is literal('p', 'Y')
+  assert lgg.generalizeLiteral( literal('q', 'Y', 'Y'), literal('q', 'e', 'f') ) is literal('q', 'Y', 'A')
+  # the next example starts over, with new names
+  lgg.newExample()
+  assert lgg.generalizeLiteral( literal('p', 'a'), literal('p', 'b') ) is literal('p', 'B')
+  assert lgg.generalizeLiteral( literal('p', 'Y'), literal('p', 'e') ) is literal('p', 'Y')
+
+
+def test_unchanged_rule_keeps_its_version(examples, learners):
+  # generalizing a rule with the clause it was made from leaves it as it is, and its coverage memo valid
+  learner = learners(examples)['pick']
+  learner.addExamples( copy.deepcopy( examples['examples']['pick'][:1] ) )
+  clause = learner.getClause(0)
+  for (ruleIndex, rule) in enumerate(learner.rules):
+    (preconds, effects) = ( rule.preconds, rule.effects )
+    effect = [ literal for literal in clause.effects if literal.typeKey() == rule.effects[0].typeKey() ][0]
+    learner.generalizeRule( effect, clause, ruleIndex )
+    assert rule.version == 0 and rule.preconds == preconds and rule.effects == effects
+
+  learner.addExamples( copy.deepcopy( examples['examples']['pick'][1:] ) )
+  assert any( rule.version != 0 for rule in learner.rules )
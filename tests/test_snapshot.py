@@ -0,0 +1,74 @@
+import copy
+import numpy as np
+from sim.ilp import ActionLearner
+from sim.runner import Runner
+
+
+def sameStore(a, b):
+  return ( a.preds == b.preds and a.codebooks == b.codebooks and a.getCore() == b.getCore() and
+           all( np.array_equal( getattr(a, name), getattr(b, name) ) for name in ('known', 'value', 'cat') ) and
+           np.array_equal( a.trueCount, b.trueCount ) and np.array_equal( a.falseCount, b.falseCount ) and
+           a.catCounts == b.catCounts )
+
+
+def test_store_round_trip(world, tmp_path):
+  runner = Runner( world['spec'], True, False )
+  for (cmd, cmd2) in world['commands'][:20]:
+    assert runner.step(cmd, cmd2)
+  store = runner.se.hyp
+  store.save( str(tmp_path) )
+
+  restored = Runner( world['spec'], True, False ).se.hyp
+  version = restored.schemaVersion
+  restored.load( str(tmp_path) )
+  assert sameStore(restored, store)
+  assert restored.schemaVersion == version + 1
+  # rows are mapped copy on write: changing them leaves the snapshot as it is
+  restored.known[...] = 0
+  restored.load( str(tmp_path) )
+  assert sameStore(restored, store) and restored.schemaVersion == version + 2
+
+
+def test_runner_round_trip(world, dumpRules, tmp_path):
+  cut = len( world['commands'] ) * 4 // 5
+  runner = Runner( world['spec'], True, False )
+  for (cmd, cmd2) in world['commands'][:cut]:
+    assert runner.step(cmd, cmd2)
+  runner.snapshot( str(tmp_path) )
+
+  restored = Runner( world['spec'], True, False )
+  restored.restore( str(tmp_path) )
+  assert sameStore( restored.se.hyp, runner.se.hyp ) and sameStore( restored.gt.hyp, runner.gt.hyp )
+  for cmd in runner.actionLearners:
+    assert dumpRules( restored.actionLearners[cmd] ) == dumpRules( runner.actionLearners[cmd] )
+  assert restored.prevState == runner.prevState and restored.numSteps == runner.numSteps
+
+  # and both go on the same way
+  for (cmd, cmd2) in world['commands'][cut:]:
+    assert runner.step(cmd, cmd2)
+    assert restored.step(cmd, cmd2)
+  assert sameStore( restored.se.hyp, runner.se.hyp ) and sameStore( restored.gt.hyp, runner.gt.hyp )
+  for cmd in runner.actionLearners:
+    assert dumpRules( restored.actionLearners[cmd] ) == dumpRules( runner.actionLearners[cmd] )
+
+
+def test_learner_restore_with_example_path(examples, dumpRules, tmp_path):
+  dataset = examples['examples']['move']
+  extraPreds = examples['extraPreds']['move']
+  cut = len(dataset) // 2
+  learner = ActionLearner( 'move', extraPreds, False )
+  learner.addExamples( copy.deepcopy( dataset[:cut] ) )
+  learner.snapshot( str( tmp_path / 'snapshot' ) )
+
+  restored = ActionLearner( 'move', extraPreds, False, str( tmp_path / 'examples' ) )
+  restored.restore( str( tmp_path / 'snapshot' ) )
+  assert dumpRules(restored) == dumpRules(learner)
+  assert restored.examples.path == str( tmp_path / 'examples' )
+
+  learner.addExamples( copy.deepcopy( dataset[cut:] ) )
+  restored.addExamples( copy.deepcopy( dataset[cut:] ) )
+  assert dumpRules(restored) == dumpRules(learner)
+  restored.examples.flush()
+  # the new examples went to the examplePath, the snapshot is left as it was
+  assert ActionLearner( 'move', extraPreds, False, str( tmp_path / 'examples' ) ).examples.numExamples() == len(dataset)
+  assert ActionLearner( 'move', extraPreds, False, str( tmp_path / 'snapshot' / 'examples' ) ).examples.numExamples() == cut
@@ -0,0 +1,38 @@
+import pytest
+from sim.util.specification_util import processInputs
+from sim.state_estimator import StateEstimator
+
+
+def hypotheses(se):
+  return sorted( repr( sorted( dict( se.hyp.row(index) ).items() ) ) for index in range( se.numHyp() ) )
+
+
+@pytest.mark.parametrize( 'world', [ 'simple-9x4-4obj-unknown', 'slippery-9x4-4obj' ], indirect=True )
+def test_lazy_branching_equals_eager(world):
+  # lazy branching splits on fewer predicates; once merged, it ends with the hypotheses eager branching ends with.
+  # the arm's armEmpty is never observed, two positions and the bool predicates the world leaves out are not
+  # observed first
+  spec = world['spec']
+  ( bool_preds, cat_preds, init_conds, observed_preds, observed_preds_first, _ ) = processInputs(
+    spec['initial_conditions'], spec['observed_predicates'], spec['observed_predicates_first'] )
+  unknown = [ '-1.armEmpty' ]
+  gt = StateEstimator(bool_preds, cat_preds, False)
+  gt.observe(init_conds)
+  (eager, lazy) = [ StateEstimator(bool_preds, cat_preds, False, True, lazyBranching) for lazyBranching in (False, True) ]
+  for se in (eager, lazy):
+    se.observe( { pred: init_conds[pred] for pred in observed_preds_first if pred not in unknown + [ '1.pos', '3.pos' ] } )
+
+  for (cmd, param, _, _) in world['trajectory'][:80]:
+    gt.applyAction( spec['gt_actions'][cmd], param )
+    for se in (eager, lazy):
+      se.applyAction( spec['se_actions'][cmd], param )
+    assert lazy.numHyp() <= eager.numHyp()
+    for se in (eager, lazy):
+      se.hypothesisRemoval()
+    assert hypotheses(lazy) == hypotheses(eager)
+
+    observations = { pred: gt.hyp.get(0, pred) for pred in observed_preds if pred not in unknown }
+    for se in (eager, lazy):
+      se.observe(observations)
+      se.hypothesisRemoval()
+    assert hypotheses(lazy) == hypotheses(eager)
@@ -0,0 +1,79 @@
+import copy
+import sim.ilp as ilp
+import sim.subsumption as subsumption
+from sim.ilp import Literal, Term, LiteralIndex
+from sim.subsumption import subsumes
+
+
+def term(value, valueType = 'constant'):
+  return Term( termType = 'obj', value = value, valueType = valueType )
+
+def literal(name, *terms, positive = True):
+  return Literal( positive = positive, name = name, arity = len(terms), terms = terms )
+
+X = term('X', 'variable')
+Y = term('Y', 'variable')
+(a, b, c) = ( term('a'), term('b'), term('c') )
+
+
+def test_shared_variables():
+  # p(X), q(X) needs the same term in both literals
+  rule = [ literal('p', X), literal('q', X) ]
+  assert not subsumes( rule, LiteralIndex( [ literal('p', a), literal('q', b) ] ) )
+  assert subsumes( rule, LiteralIndex( [ literal('p', a), literal('q', a) ] ) )
+  # found past a first candidate that doesn't fit
+  assert subsumes( rule, LiteralIndex( [ literal('p', a), literal('p', b), literal('q', b) ] ) )
+  assert subsumes( rule, LiteralIndex( [ literal('p', a), literal('q', b), literal('q', a) ] ) )
+
+  # a variable shared within a literal and across two
+  rule = [ literal('r', X, Y), literal('r', Y, X) ]
+  assert not subsumes( rule, LiteralIndex( [ literal('r', a, b), literal('r', b, c) ] ) )
+  assert subsumes( rule, LiteralIndex( [ literal('r', a, b), literal('r', b, a) ] ) )
+  assert subsumes( [ literal('r', X, X) ], LiteralIndex( [ literal('r', a, b), literal('r', c, c) ] ) )
+  assert not subsumes( [ literal('r', X, X) ], LiteralIndex( [ literal('r', a, b) ] ) )
+
+  # bindings given, e.g. by the effect, are kept
+  assert not subsumes( [ literal('p', X) ], LiteralIndex( [ literal('p', a) ] ), { 'X': b.key() } )
+  assert subsumes( [ literal('p', X) ], LiteralIndex( [ literal('p', a) ] ), { 'X': a.key() } )
+  # positive and negative literals don't match
+  assert not subsumes( [ literal('p', X, positive = False) ], LiteralIndex( [ literal('p', a) ] ) )
+
+
+def test_ground_literals(monkeypatch):
+  # ground literals are looked up by key, no matching
+  def fail(*args):
+    raise AssertionError("matched a ground literal")
+  monkeypatch.setattr( subsumption, 'matchLiteral', fail )
+  clause = LiteralIndex( [ literal('p', a), literal('q', a, b) ] )
+  assert subsumes( [ literal('p', a), literal('q', a, b) ], clause )
+  assert not subsumes( [ literal('p', a), literal('q', b, a) ], clause )
+  assert not subsumes( [ literal('p', b) ], clause )
+
+
+def test_coverage_memo(examples, monkeypatch):
+  learner = ilp.ActionLearner( 'pick', examples['extraPreds']['pick'], False )
+  learner.addExamples( copy.deepcopy( examples['examples']['pick'] ) )
+  calls = []
+  def counted(*args):
+    calls.append(args)
+    return subsumes(*args)
+  monkeypatch.setattr( ilp, 'subsumes', counted )
+
+  rule = learner.rules[0]
+  exampleIndex = list(rule.E_minus)[0] if len(rule.E_minus) != 0 else 0
+  first = learner.covers( 0, exampleIndex = exampleIndex )
+  assert learner.covers( 0, exampleIndex = exampleIndex ) == first and len(calls) == 1
+
+  # a new version of the rule is checked again, and checked only once
+  rule.version += 1
+  assert learner.covers( 0, exampleIndex = exampleIndex ) == first and len(calls) == 2
+  assert learner.covers( 0, exampleIndex = exampleIndex ) == first and len(calls) == 2
+
+  # the memo isn't used for a rule that changed: with no preconditions, the rule covers every example
+  preconds = rule.preconds
+  rule.preconds = []
+  rule.version += 1
+  assert learner.covers( 0, exampleIndex = exampleIndex ) and len(calls) == 3
+  rule.preconds = preconds
+  rule.version += 1
+  assert learner.covers( 0, exampleIndex = exampleIndex ) == first and len(calls) == 4
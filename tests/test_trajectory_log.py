@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from sim.runner import Runner
+from sim.trajectory_log import TrajectoryLog, readHeader, readTrajectory
+
+# steps as ( prevState, cmd, param, learnerParam, learnerParamTypes, newState )
+STEPS = [
+  ( { 'a.pos': (1, 2), 'armEmpty': True, 'held': None },
+    'move', { 'q1': (1, 2), 'q2': (3, 4) }, { 'q1': (1, 2), 'q2': (3, 4) }, { 'q1': 'pos', 'q2': 'pos' },
+    { 'a.pos': (3, 4), 'armEmpty': True, 'held': None } ),
+  # not contiguous: prev differs from the last next, and a predicate goes away
+  ( { 'a.pos': (3, 5), 'armEmpty': True },
+    'pick', { 'b': np.int64(0), 'p': (3, 5) }, { 'b': 'a', 'p': (3, 5) }, { 'b': 'obj', 'p': 'pos' },
+    { 'a.pos': (3, 5), 'armEmpty': False, 'held': 'a' } ),
+  ( { 'a.pos': (3, 5), 'armEmpty': False, 'held': 'a' },
+    'place', { 'b': 0, 'q': (0, 0) }, { 'b': 'a', 'q': (0, 0) }, { 'b': 'obj', 'q': 'pos' },
+    { 'a.pos': (0, 0), 'armEmpty': True, 'held': None } ),
+]
+
+
+def write(path, steps = STEPS):
+  log = TrajectoryLog(path, 'test')
+  for step in steps:
+    log.append(*step)
+  log.close()
+
+def check(path, steps = STEPS):
+  read = list( readTrajectory(path) )
+  assert len(read) == len(steps)
+  for (step, (prev, cmd, param, learnerParam, types, new)) in zip(read, steps):
+    assert step == { 'cmd': cmd, 'param': param, 'learnerParam': learnerParam, 'types': types, 'prev': prev, 'next': new }
+    assert [ type(v) for v in step['prev'].values() ] == [ type(v) for v in prev.values() ]
+
+
+def test_round_trip(tmp_path):
+  path = str( tmp_path / 'log.jsonl' )
+  write(path)
+  assert readHeader(path)['specification'] == 'test'
+  check(path)
+
+
+def test_truncated_last_line(tmp_path):
+  path = str( tmp_path / 'log.jsonl' )
+  write(path)
+  size = os.path.getsize(path)
+  with open(path, 'a') as f:
+    f.write( '{"cmd":"mo' )
+  check(path)
+
+  # reopening drops the partial line and appends after the last whole one
+  log = TrajectoryLog(path, 'test')
+  assert log.numSteps == len(STEPS) and os.path.getsize(path) == size
+  log.append( *STEPS[0] )
+  log.close()
+  check( path, STEPS + STEPS[:1] )
+
+
+def test_replay_equals_live(world, dumpRules, tmp_path):
+  path = str( tmp_path / 'log.jsonl' )
+  live = Runner( world['spec'], True, False, logPath=path )
+  for (cmd, cmd2) in world['commands']:
+    assert live.step(cmd, cmd2)
+  live.close()
+
+  replayed = Runner( world['spec'], True, False )
+  assert replayed.replay(path, chunkSize = 16) == len( world['commands'] )
+  for cmd in live.actionLearners:
+    assert dumpRules( replayed.actionLearners[cmd] ) == dumpRules( live.actionLearners[cmd] )
+  assert str( replayed.se.toDataFrame() ) == str( live.se.toDataFrame() )
+  assert sorted( replayed.gt.getCore() ) == sorted( live.gt.getCore() )
+  assert replayed.prevState == live.prevState and replayed.numSteps == live.numSteps
+  replayed.close()